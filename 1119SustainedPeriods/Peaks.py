@@ -1,80 +1,140 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
-from scipy.signal import find_peaks
-import matplotlib.pyplot as plt
 
-def identify_sustained_declines(df):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Decimation import PLOT_POINTS, decimation_indices
+from DemandPeaks import peak_catalog
+from DemandPlots import render_figures
+from PartitionedStore import read_month_sheets
+
+# Minimum prominence (kW) of the peaks marked on the plots
+PEAK_PROMINENCE = 250
+
+def _streak_lengths(flags):
+    """Number of consecutive True values starting at each position."""
+    positions = np.arange(len(flags))
+    next_false = np.where(flags, len(flags), positions)
+    next_false = np.minimum.accumulate(next_false[::-1])[::-1]
+    return next_false - positions
+
+def find_sustained_declines(values, lookahead=2, min_decline_length=3):
+    """
+    Finds periods of sustained decline in a series of values.
+
+    A decline starts at a peak when the value drops and keeps falling (or
+    staying flat) for the next lookahead steps; it ends at the first rise that
+    keeps rising (or staying flat) for the next lookahead steps. Both
+    confirmations come from the sign of np.diff and the length of the
+    non-increasing / non-decreasing runs after each point, so the whole
+    series is scanned with array operations.
+
+    Args:
+        values (array-like): Values in time order
+        lookahead (int): Steps after a drop (or rise) that must confirm it
+        min_decline_length (int): Minimum number of steps from peak to trough
+
+    Returns:
+        pd.DataFrame: One row per decline with start_idx (position of the
+        peak), end_idx (position of the trough, inclusive), peak, trough and
+        duration (steps from peak to trough; a decline still running at the
+        end of the data counts the number of points instead)
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    columns = ['start_idx', 'end_idx', 'peak', 'trough', 'duration']
+    if n < 2:
+        return pd.DataFrame(columns=columns)
+
+    steps = np.diff(values)
+
+    # A drop at i confirmed by lookahead non-increasing steps from i, and a
+    # rise at i confirmed by lookahead non-decreasing steps from i
+    falling_streak = np.append(_streak_lengths(steps <= 0), 0)
+    rising_streak = np.append(_streak_lengths(steps >= 0), 0)
+    drops = np.flatnonzero(steps < 0) + 1
+    rises = np.flatnonzero(steps > 0) + 1
+    starts = drops[falling_streak[drops] >= lookahead]
+    ends = rises[rising_streak[rises] >= lookahead]
+
+    # Alternate start, end, start, ...: keep the first event of every run of
+    # the same kind, beginning with a start
+    events = np.concatenate([starts, ends])
+    is_start = np.concatenate([np.ones(len(starts), dtype=bool), np.zeros(len(ends), dtype=bool)])
+    order = np.argsort(events, kind='stable')
+    events, is_start = events[order], is_start[order]
+    keep = np.ones(len(events), dtype=bool)
+    keep[1:] = is_start[1:] != is_start[:-1]
+    keep &= np.cumsum(is_start) > 0
+    events, is_start = events[keep], is_start[keep]
+
+    start_idx = events[is_start] - 1  # Include the peak
+    end_idx = events[~is_start]
+    duration = end_idx - start_idx[:len(end_idx)]
+
+    # A decline still running at the end of the data
+    if len(start_idx) > len(end_idx):
+        end_idx = np.append(end_idx, n - 1)
+        duration = np.append(duration, n - start_idx[-1])
+
+    declines = pd.DataFrame({
+        'start_idx': start_idx,
+        'end_idx': end_idx,
+        'peak': values[start_idx],
+        'trough': values[end_idx],
+        'duration': duration,
+    })
+    return declines[declines['duration'] >= min_decline_length].reset_index(drop=True)
+
+def expand_declines(df, declines):
+    """
+    Rows of every decline period, with the period's start and end time, peak
+    and trough values, total decline and duration added to each row.
+    """
+    if declines.empty:
+        return pd.DataFrame()
+
+    lengths = (declines['end_idx'] - declines['start_idx'] + 1).to_numpy()
+    period = np.repeat(np.arange(len(declines)), lengths)
+    positions = declines['start_idx'].to_numpy()[period] + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    expanded = df.iloc[positions].copy()
+    date_times = df['DateTime'].to_numpy()
+    expanded['decline_start_time'] = date_times[declines['start_idx'].to_numpy()][period]
+    expanded['decline_end_time'] = date_times[declines['end_idx'].to_numpy()][period]
+    expanded['peak_value'] = declines['peak'].to_numpy()[period]
+    expanded['trough_value'] = declines['trough'].to_numpy()[period]
+    expanded['total_decline'] = (declines['peak'] - declines['trough']).to_numpy()[period]
+    expanded['decline_duration'] = declines['duration'].to_numpy()[period]
+    return expanded
+
+def identify_sustained_declines(df, lookahead=2, min_decline_length=3):
     """
     Identifies periods of sustained decline in the value column.
     A sustained decline is defined as a period where the overall trend is negative,
     from a peak until the values start increasing again.
+
+    Returns the rows of every period (see expand_declines); use
+    find_sustained_declines for the compact table of periods.
     """
     if 'Value' not in df.columns:
         print("Warning: Value column not found. Available columns:", df.columns.tolist())
         return pd.DataFrame()
-    
-    # Initialize lists to store decline periods
-    decline_periods = []
-    in_decline = False
-    decline_start_idx = None
-    previous_value = None
-    min_decline_length = 3  # Minimum number of points to consider it a real decline
-    
-    values = df['Value'].values
-    
-    for i in range(len(values)):
-        current_value = values[i]
-        
-        if previous_value is not None:
-            if not in_decline:
-                # Check if this could be the start of a decline
-                if current_value < previous_value:
-                    # Look ahead to confirm it's a real decline trend
-                    if i < len(values) - 2:  # Ensure we have points to look ahead
-                        next_few_points = values[i:i+3]  # Look at next few points
-                        if all(next_few_points[j] <= next_few_points[j-1] for j in range(1, len(next_few_points))):
-                            in_decline = True
-                            decline_start_idx = i - 1  # Include the peak
-            else:
-                # We're in a decline period, check if it's ending
-                if current_value > previous_value:
-                    # Look ahead to confirm the trend is really reversing
-                    if i < len(values) - 2:  # Ensure we have points to look ahead
-                        next_few_points = values[i:i+3]  # Look at next few points
-                        if all(next_few_points[j] >= next_few_points[j-1] for j in range(1, len(next_few_points))):
-                            # End of decline period
-                            if i - decline_start_idx >= min_decline_length:
-                                decline_period = df.iloc[decline_start_idx:i+1].copy()
-                                decline_period['decline_start_time'] = df.iloc[decline_start_idx]['DateTime']
-                                decline_period['decline_end_time'] = df.iloc[i]['DateTime']
-                                decline_period['peak_value'] = values[decline_start_idx]
-                                decline_period['trough_value'] = values[i]
-                                decline_period['total_decline'] = values[decline_start_idx] - values[i]
-                                decline_period['decline_duration'] = i - decline_start_idx
-                                decline_periods.append(decline_period)
-                            in_decline = False
-                            decline_start_idx = None
-        
-        previous_value = current_value
-    
-    # Handle case where decline continues to the end of the dataset
-    if in_decline and (len(values) - decline_start_idx >= min_decline_length):
-        decline_period = df.iloc[decline_start_idx:].copy()
-        decline_period['decline_start_time'] = df.iloc[decline_start_idx]['DateTime']
-        decline_period['decline_end_time'] = df.iloc[-1]['DateTime']
-        decline_period['peak_value'] = values[decline_start_idx]
-        decline_period['trough_value'] = values[-1]
-        decline_period['total_decline'] = values[decline_start_idx] - values[-1]
-        decline_period['decline_duration'] = len(values) - decline_start_idx
-        decline_periods.append(decline_period)
-    
-    if decline_periods:
-        return pd.concat(decline_periods)
-    return pd.DataFrame()
+
+    declines = find_sustained_declines(df['Value'].values, lookahead, min_decline_length)
+    return expand_declines(df, declines)
 
 def process_monthly_circuits(excel_file):
     """
     Process each month's sheet for both circuits and identify sustained decline periods.
+    excel_file may also be a partitioned store folder (see PartitionedStore).
+
+    Returns:
+        dict: "<Month>_Circuit_<X>" -> (circuit_data, declines), where declines
+        is the compact table from find_sustained_declines (positions refer to
+        circuit_data)
     """
     months = ['April', 'May', 'June', 'July', 'August', 'September']
     results = {}
@@ -82,7 +142,7 @@ def process_monthly_circuits(excel_file):
     for month in months:
         try:
             print(f"Processing sheet: {month}")
-            df = pd.read_excel(excel_file, sheet_name=month)
+            df = read_month_sheets(excel_file, [month])[month]
             
             for circuit in ['A', 'B']:
                 circuit_data = df[df['Circuit'] == circuit].copy()
@@ -107,10 +167,10 @@ def process_monthly_circuits(excel_file):
                 circuit_data = circuit_data.sort_values('DateTime')
                 
                 # Find sustained decline periods
-                decline_periods = identify_sustained_declines(circuit_data)
+                decline_periods = find_sustained_declines(circuit_data['Value'].values)
                 
                 if not decline_periods.empty:
-                    results[f"{month}_Circuit_{circuit}"] = decline_periods
+                    results[f"{month}_Circuit_{circuit}"] = (circuit_data, decline_periods)
                     print(f"Found {len(decline_periods)} decline periods for {month} Circuit {circuit}")
                 else:
                     print(f"No sustained decline periods found for {month} Circuit {circuit}")
@@ -120,33 +180,69 @@ def process_monthly_circuits(excel_file):
             
     return results
 
-def plot_circuit_declines(df, decline_df, circuit, month):
+def draw_circuit_declines(ax, df, decline_df, circuit, month, peaks=None, max_points=None):
     """
-    Creates a plot showing original data and sustained decline periods for a specific circuit.
+    Draws the original data and sustained decline periods for a specific circuit.
+
+    decline_df is the table from find_sustained_declines, with positions in df.
+    peaks, when given, is a DemandPeaks.peak_catalog table to mark on the plot.
+    With max_points, the data is decimated to about that many points
+    (Decimation.decimation_indices), keeping the start and end of every decline.
     """
-    plt.figure(figsize=(15, 8))
+    positions = np.arange(len(df))
+    if max_points is not None:
+        levels = df['DemandLimit'] if 'DemandLimit' in df.columns else None
+        bounds = np.concatenate([decline_df['start_idx'], decline_df['end_idx']])
+        positions = decimation_indices(df['Date'], df['Value'], max_points, levels=levels, keep=bounds)
+    shown = df.iloc[positions]
     
     # Plot original data
-    plt.plot(df['Date'], df['Value'], label='Original Data', alpha=0.6)
+    ax.plot(shown['Date'], shown['Value'], label='Original Data', alpha=0.6)
     
     # Plot decline periods with different colors
-    for i, group in enumerate(decline_df.groupby('decline_start_time')):
-        period_data = group[1]
-        plt.plot(period_data['Date'], period_data['Value'], 
+    for start_idx, end_idx in zip(decline_df['start_idx'], decline_df['end_idx']):
+        period_data = shown.iloc[np.searchsorted(positions, start_idx):np.searchsorted(positions, end_idx, side='right')]
+        ax.plot(period_data['Date'], period_data['Value'], 
                 'r-', linewidth=2, alpha=0.8)
     
+    # Mark the peaks the declines start from
+    if peaks is not None and not peaks.empty:
+        ax.scatter(peaks['Time'], peaks['Value'], color='black', marker='x', zorder=3, label='Peaks')
+    
     if decline_df.empty:
-        plt.title(f'{month} - Circuit {circuit} (No Sustained Declines Found)')
+        ax.set_title(f'{month} - Circuit {circuit} (No Sustained Declines Found)')
     else:
-        plt.title(f'{month} - Circuit {circuit} Sustained Decline Periods')
+        ax.set_title(f'{month} - Circuit {circuit} Sustained Decline Periods')
     
-    plt.xlabel('Date')
-    plt.ylabel('Value')
-    plt.legend()
-    plt.xticks(rotation=45)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Value')
+    ax.legend()
+    ax.tick_params(axis='x', labelrotation=45)
+
+def plot_circuit_declines(df, decline_df, circuit, month, peaks=None, max_points=PLOT_POINTS):
+    """
+    Creates a plot showing original data and sustained decline periods for a specific circuit.
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(15, 8))
+    draw_circuit_declines(ax, df, decline_df, circuit, month, peaks, max_points)
     plt.tight_layout()
     plt.show()
 
+def render_circuit_declines(df, decline_df, circuit, month, peaks=None, max_points=PLOT_POINTS,
+                           output_file=None):
+    """
+    Saves the decline plot of a circuit as a PNG without opening a window.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(15, 8))
+    draw_circuit_declines(fig.subplots(), df, decline_df, circuit, month, peaks, max_points)
+    fig.tight_layout()
+    fig.savefig(output_file)
+    return output_file
+
 def analyze_all_circuits(excel_file):
     """
     Analyze and visualize sustained decline periods for all months and circuits.
@@ -161,24 +257,28 @@ def analyze_all_circuits(excel_file):
     output_file = 'sustained_decline_periods.xlsx'
     print(f"Saving results to {output_file}")
     with pd.ExcelWriter(output_file) as writer:
-        for key, df in results.items():
+        for key, (circuit_data, declines) in results.items():
             sheet_name = key[:31]
-            df.to_excel(writer, sheet_name=sheet_name)
+            # Expand the periods to their rows only for the workbook
+            expand_declines(circuit_data, declines).to_excel(writer, sheet_name=sheet_name)
             print(f"Saved sheet: {sheet_name}")
     
     return results# Run the analysis with your specific filename
 decline_results = analyze_all_circuits('ATestByMonth.xlsx')
 
-# Then for each month and circuit, create the plot
+# Then for each month and circuit, save the plot (<Month><Circuit>DecliningPeriods.png);
+# the plots are rendered in parallel, and only when their data changed
+jobs = []
 months = ['April', 'May', 'June', 'July', 'August', 'September']
 for month in months:
     for circuit in ['A', 'B']:
-        # Read original data
-        df = pd.read_excel('ATestByMonth.xlsx', sheet_name=month)
-        circuit_data = df[df['Circuit'] == circuit].copy()
-        
-        # Get decline periods for this month/circuit
+        # Get decline periods for this month/circuit, with the data they index
         decline_key = f"{month}_Circuit_{circuit}"
         if decline_key in decline_results:
-            decline_df = decline_results[decline_key]
-            plot_circuit_declines(circuit_data, decline_df, circuit, month)
+            circuit_data, decline_df = decline_results[decline_key]
+            peaks = peak_catalog(circuit_data, prominence=PEAK_PROMINENCE)
+            plot_data = circuit_data[['Date', 'Value', 'DemandLimit']].reset_index(drop=True)
+            jobs.append((f'{month}{circuit}DecliningPeriods.png', render_circuit_declines,
+                         (plot_data, decline_df, circuit, month, peaks), {}))
+
+render_figures(jobs, output_dir=os.path.dirname(os.path.abspath(__file__)))
@@ -1,8 +1,73 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import os
+import sys
 
-def process_excel_file(input_file, output_file):
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from WorkbookCache import read_sheet
+
+# Hours kept on each side of a daily peak
+PEAK_WINDOW_HOURS = 2
+
+def peak_windows(df, hours=PEAK_WINDOW_HOURS, peaks=None):
+    """
+    Rows within ±hours of the daily peak of each circuit.
+
+    The daily maxima come from one grouped idxmax over (Circuit, Day). The
+    rows are sorted by Circuit, Day and Date once, and each window's bounds
+    are found with searchsorted on the sorted timestamps. The whole frame is
+    handled in O(n log n), and windows of different days never overlap.
+
+    Args:
+        df (pd.DataFrame): One month sheet with Circuit, Day, Date and Value
+        hours (float): Width of the window on each side of the peak
+        peaks (pd.DataFrame): Peaks to centre the windows on, e.g.
+            DemandPeaks.daily_peaks of a peak catalog (their Row labels are
+            used); by default the highest reading of each circuit and day
+
+    Returns:
+        pd.DataFrame: Window rows sorted by Circuit, Day and Date, without
+        duplicate rows
+    """
+    if df.empty:
+        return df.copy()
+
+    # Peak row of each (circuit, day); the first one when the maximum repeats
+    if peaks is None:
+        peak_labels = df.groupby(['Circuit', 'Day'], sort=False)['Value'].idxmax()
+    else:
+        peak_labels = peaks['Row']
+
+    # Rows of each (circuit, day) together, in time order
+    ordered = df.sort_values(['Circuit', 'Day', 'Date'], kind='stable')
+    group = ordered.groupby(['Circuit', 'Day'], sort=False).ngroup().to_numpy()
+    times = pd.to_datetime(ordered['Date']).to_numpy().astype('datetime64[ms]').view(np.int64)
+
+    # Sortable key (group, time); each group gets a range wide enough that a
+    # window never reaches into the neighbouring group
+    width = int(hours * 3_600_000)
+    offset = times - times.min() + width
+    span = int(offset.max()) + width + 1
+    keys = group.astype(np.int64) * span + offset
+
+    peak_positions = ordered.index.get_indexer(peak_labels.to_numpy())
+    peak_keys = keys[peak_positions]
+    starts = np.searchsorted(keys, peak_keys - width, side='left')
+    ends = np.searchsorted(keys, peak_keys + width, side='right')
+
+    # Window rows in (circuit, day, date) order
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    lengths = ends - starts
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    # Remove any duplicates while keeping all columns
+    return ordered.iloc[positions].drop_duplicates()
+
+def process_excel_file(input_file, output_file, hours=PEAK_WINDOW_HOURS):
     # List of months to process
     months = ['April', 'May', 'June', 'July', 'August', 'September']
     
@@ -12,51 +77,12 @@ def process_excel_file(input_file, output_file):
         for month in months:
             try:
                 # Read the sheet for current month
-                df = pd.read_excel(input_file, sheet_name=month)
-                
-                # Create a list to store all filtered data
-                all_filtered_rows = []
-                
-                # Get unique circuits
-                unique_circuits = df['Circuit'].unique()
+                df = read_sheet(input_file, month)
                 
-                # Process each circuit separately
-                for circuit in unique_circuits:
-                    # Filter data for this circuit
-                    circuit_data = df[df['Circuit'] == circuit].copy()
-                    
-                    # Get unique days
-                    unique_days = circuit_data['Day'].unique()
-                    
-                    # For each day, find the peak and surrounding hours
-                    for day in unique_days:
-                        # Get data for this day and circuit
-                        day_data = circuit_data[circuit_data['Day'] == day]
-                        
-                        # Find the row with maximum Value
-                        peak_row = day_data.loc[day_data['Value'].idxmax()]
-                        peak_date = peak_row['Date']
-                        
-                        # Find rows within ±2 hours of the peak time for this circuit and day
-                        matching_rows = df[
-                            (df['Circuit'] == circuit) &
-                            (df['Day'] == day) &
-                            (df['Date'] >= peak_date - timedelta(hours=2)) &
-                            (df['Date'] <= peak_date + timedelta(hours=2))
-                        ]
-                        
-                        all_filtered_rows.append(matching_rows)
+                # Rows within the window around each daily peak, for every circuit
+                filtered_df = peak_windows(df, hours)
                 
-                # Combine all filtered rows
-                if all_filtered_rows:
-                    filtered_df = pd.concat(all_filtered_rows)
-                    
-                    # Sort by Circuit, Day, and Date
-                    filtered_df = filtered_df.sort_values(['Circuit', 'Day', 'Date'])
-                    
-                    # Remove any duplicates while keeping all columns
-                    filtered_df = filtered_df.drop_duplicates()
-                    
+                if not filtered_df.empty:
                     # Write to new Excel file, maintaining all original columns
                     filtered_df.to_excel(writer, sheet_name=month, index=False)
                 else:
@@ -69,7 +95,8 @@ def process_excel_file(input_file, output_file):
     print(f"Processing complete. Output saved to {output_file}")
 
 # Example usage
-input_file = "ATestByMonth.xlsx"
-output_file = "ATestByMonth_Processed.xlsx"
+if __name__ == "__main__":
+    input_file = "ATestByMonth.xlsx"
+    output_file = "ATestByMonth_Processed.xlsx"
 
-process_excel_file(input_file, output_file)
+    process_excel_file(input_file, output_file)
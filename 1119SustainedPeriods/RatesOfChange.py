@@ -1,98 +1,136 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import os
+import sys
 
-def calculate_rate_of_change(group):
-    """Calculate rate of change for a group of rows."""
-    if len(group) < 2:
-        return 0
-    total_value_change = group['Value'].iloc[-1] - group['Value'].iloc[0]
-    time_periods = len(group)
-    return total_value_change / (15 * time_periods)
-
-def identify_sustained_periods(df, time_threshold=timedelta(minutes=16)):  # Increased threshold slightly
-    """Identify sustained decline periods based on time difference."""
-    df = df.copy()
-    df['TimeDiff'] = df['Date'].diff()
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PartitionedStore import read_month_sheets
+
+# Variants written for each sheet: (sheet suffix, break column or None)
+ROC_VARIANTS = [
+    ('BasicROC', None),
+    ('DemandLimitROC', 'DemandLimit'),
+    ('SyncedDemandROC', 'SyncedDemandLimit'),
+]
+
+def segment_periods(df, period_start, break_column=None):
+    """
+    Summarize every period of at least two points with one groupby().agg pass.
+
+    Periods are runs of consecutive rows; a new one begins where period_start
+    is True. The aggregation works on row positions, so the first and last
+    Date/Value of each period are looked up in bulk afterwards.
+
+    Args:
+        df (pd.DataFrame): Sheet with Date and Value columns, in time order
+        period_start (np.ndarray): True on the first row of each period
+        break_column (str): Column whose value is reported for each period
+
+    Returns:
+        pd.DataFrame: PeriodStart, PeriodEnd, InitialValue, FinalValue,
+        NumberOfPoints, RateOfChange (and break_column) per period
+    """
+    positions = pd.DataFrame({
+        'PeriodID': np.cumsum(period_start),
+        'Position': np.arange(len(df))
+    })
+    periods = positions.groupby('PeriodID', sort=False).agg(
+        First=('Position', 'first'),
+        Last=('Position', 'last'),
+        NumberOfPoints=('Position', 'size')
+    )
+
+    # Only periods with at least 2 points
+    periods = periods[periods['NumberOfPoints'] >= 2]
+    if periods.empty:
+        return pd.DataFrame()
+    first = periods['First'].to_numpy()
+    last = periods['Last'].to_numpy()
+    points = periods['NumberOfPoints'].to_numpy()
+
+    dates = df['Date'].reset_index(drop=True)
+    values = df['Value'].reset_index(drop=True)
+    result = pd.DataFrame({
+        'PeriodStart': dates.take(first).to_numpy(),
+        'PeriodEnd': dates.take(last).to_numpy(),
+        'InitialValue': values.take(first).to_numpy(),
+        'FinalValue': values.take(last).to_numpy(),
+        'NumberOfPoints': points
+    })
+    result['RateOfChange'] = (result['FinalValue'] - result['InitialValue']) / (15 * points)
+
+    if break_column:
+        result[break_column] = df[break_column].take(first).to_numpy()
+
+    return result
+
+def rates_of_change(df, variants=ROC_VARIANTS, time_threshold=timedelta(minutes=16)):
+    """
+    Rate of change tables for all variants of a sheet from one scan.
+
+    The time breaks are found once and shared; each break column only adds
+    the rows where its value changes.
+
+    Args:
+        df (pd.DataFrame): Sheet with Date and Value columns, in time order
+        variants (list): (name, break column or None) pairs
+        time_threshold (timedelta): Gap that ends a sustained period
+
+    Returns:
+        dict: Variant name -> segment_periods table (None when the sheet has
+        no such break column)
+    """
     # Consider a break only if the time difference is significantly more than 15 minutes
-    df['PeriodStart'] = (df['TimeDiff'] > time_threshold) | (df['TimeDiff'].isna())
-    df['PeriodID'] = df['PeriodStart'].cumsum()
-    return df
+    time_diff = df['Date'].diff()
+    time_breaks = ((time_diff > time_threshold) | time_diff.isna()).to_numpy()
+
+    tables = {}
+    for name, break_column in variants:
+        if break_column and break_column not in df.columns:
+            print(f"Warning: Column '{break_column}' not found in sheet. Available columns: {df.columns.tolist()}")
+            tables[name] = None
+            continue
+
+        period_start = time_breaks
+        if break_column:
+            # Directly compare consecutive values
+            column = df[break_column]
+            period_start = time_breaks | (column != column.shift()).to_numpy()
+
+        tables[name] = segment_periods(df, period_start, break_column)
+
+    return tables
 
 def process_sheet(df, output_suffix, group_by_column=None):
     """Process a single sheet with optional grouping column."""
-    # Check if the group_by_column exists
-    if group_by_column and group_by_column not in df.columns:
-        print(f"Warning: Column '{group_by_column}' not found in sheet. Available columns: {df.columns.tolist()}")
-        return None
-    
-    # Identify sustained periods
-    df_processed = identify_sustained_periods(df)
-    
-    # If there's a group_by_column, we need to split periods when that column changes
-    if group_by_column:
-        # Instead of using diff(), directly compare consecutive values
-        df_processed['ValueChange'] = (df_processed[group_by_column] != 
-                                     df_processed[group_by_column].shift()).fillna(False)
-        df_processed['PeriodID'] = (df_processed['PeriodStart'] | 
-                                  df_processed['ValueChange']).cumsum()
-    
-    # Calculate rate of change for each period
-    results = []
-    for period_id, group in df_processed.groupby('PeriodID'):
-        # Only process groups with at least 2 points
-        if len(group) >= 2:
-            rate = calculate_rate_of_change(group)
-            
-            # Create a row for each period
-            result_row = {
-                'PeriodStart': group['Date'].iloc[0],
-                'PeriodEnd': group['Date'].iloc[-1],
-                'InitialValue': group['Value'].iloc[0],
-                'FinalValue': group['Value'].iloc[-1],
-                'NumberOfPoints': len(group),
-                'RateOfChange': rate
-            }
-            
-            if group_by_column:
-                result_row[group_by_column] = group[group_by_column].iloc[0]
-                
-            results.append(result_row)
-    
-    return pd.DataFrame(results)
+    tables = rates_of_change(df, [(output_suffix, group_by_column)])
+    return tables[output_suffix]
 
 def process_excel_file(file_path):
-    """Process all sheets in the Excel file."""
-    # Read the Excel file
-    excel_file = pd.ExcelFile(file_path)
+    """Process all sheets in the Excel file (or all months of a partitioned store folder)."""
+    # Read all sheets of the Excel file in one pass
+    sheets = read_month_sheets(file_path)
+    
+    output_file = f'processed_{file_path}'
+    if os.path.isdir(file_path):
+        output_file = f'processed_{os.path.basename(os.path.normpath(file_path))}.xlsx'
     
     # Create a new Excel writer object
-    with pd.ExcelWriter(f'processed_{file_path}', engine='openpyxl') as writer:
+    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
         # Process each sheet
-        for sheet_name in excel_file.sheet_names:
+        for sheet_name, df in sheets.items():
             print(f"\nProcessing sheet: {sheet_name}")
             
-            # Read the original sheet
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            
             # Convert Date column to datetime if it's not already
             df['Date'] = pd.to_datetime(df['Date'])
             
-            # Process with different conditions
-            # 1. Basic rate of change
-            basic_roc = process_sheet(df, '_basic')
-            if basic_roc is not None:
-                basic_roc.to_excel(writer, sheet_name=f'{sheet_name}_BasicROC', index=False)
-            
-            # 2. Rate of change with DemandLimit breaks
-            demand_limit_roc = process_sheet(df, '_demand_limit', 'DemandLimit')
-            if demand_limit_roc is not None:
-                demand_limit_roc.to_excel(writer, sheet_name=f'{sheet_name}_DemandLimitROC', index=False)
-            
-            # 3. Rate of change with SyncedDemandLimit breaks
-            synced_demand_roc = process_sheet(df, '_synced_demand', 'SyncedDemandLimit')
-            if synced_demand_roc is not None:
-                synced_demand_roc.to_excel(writer, sheet_name=f'{sheet_name}_SyncedDemandROC', index=False)
+            # Basic rate of change, and with DemandLimit / SyncedDemandLimit breaks
+            for name, roc in rates_of_change(df).items():
+                if roc is not None:
+                    roc.to_excel(writer, sheet_name=f'{sheet_name}_{name}', index=False)
 
 # Usage
 if __name__ == "__main__":
@@ -1,50 +1,116 @@
 import pandas as pd
 import numpy as np
+import os
+import sys
+
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from WorkbookCache import read_workbook
+
+# Rows per transition in the transitions sheets written with one context point
+# (TransitionPoints.CONTEXT_POINTS = 1): context before (CB), transition before
+# (TB), transition after (TA) and context after (CA)
+POINTS_PER_TRANSITION = 4
+SEGMENTS = ['CB-TB', 'TB-TA', 'TA-CA']
+
+# Minutes between readings, used when the sheet has no timestamps
+READING_INTERVAL = 15
+
+def transition_points(df):
+    """
+    Rows per transition in a transitions sheet (2 * context points + 2).
+
+    Taken from the rows of each GlobalTransitionNumber, so sheets written with
+    any number of context points are read correctly; sheets without that
+    column are taken to hold POINTS_PER_TRANSITION rows per transition.
+    """
+    if 'GlobalTransitionNumber' not in df.columns or df.empty:
+        points = POINTS_PER_TRANSITION
+    else:
+        sizes = df.groupby('GlobalTransitionNumber', sort=False).size()
+        if sizes.nunique() != 1:
+            raise ValueError(f"Transitions have different numbers of rows: {sorted(map(int, sizes.unique()))}")
+        points = int(sizes.iloc[0])
+
+    if points < 4 or points % 2 or len(df) % points:
+        raise ValueError(f"{len(df)} rows cannot be split into transitions of {points} rows "
+                         "(context rows, from, to, context rows)")
+    return points
+
+def calculate_rates(df, time_column='Date'):
+    """
+    Rate of change (kW per minute) over the CB->TB, TB->TA and TA->CA segments
+    of every transition.
+
+    The sheet is read in blocks of one transition (see transition_points). CB
+    and CA are the outermost context rows of the block, TB and TA the 'from'
+    and 'to' rows, so with one context point these are the four rows in order.
+    Value (and the timestamps) of those rows form an (n, 4) array so all
+    segment rates come from one np.diff, divided by the real time between the
+    readings. Segments whose readings share a timestamp get NaN.
+
+    Args:
+        df (pd.DataFrame): Transitions sheet (the rows of each transition in
+            time order)
+        time_column (str): Timestamp column; when it is missing, readings are
+            taken to be READING_INTERVAL minutes apart
+
+    Returns:
+        pd.DataFrame: Circuit, Month, Combined_Context (categorical
+        "(TransitionType)Segment" label) and Rate_of_Change, three rows per
+        transition
+    """
+    points = transition_points(df)
+    n = len(df) // points
+
+    # Overlapping transitions can be interleaved when the sheet is sorted by
+    # date; bring the rows of each transition together, keeping their order
+    if 'GlobalTransitionNumber' in df.columns:
+        df = df.sort_values('GlobalTransitionNumber', kind='stable')
+
+    # Every block must be a single transition of a single type
+    labels, _ = df['TransitionType'].factorize(use_na_sentinel=False)
+    labels = labels.reshape(n, points)
+    if (labels != labels[:, :1]).any():
+        raise ValueError(f"The TransitionType labels do not line up with blocks of {points} rows")
+
+    # CB, TB, TA and CA rows of every transition
+    first_rows = np.arange(n) * points
+    picked = first_rows[:, None] + np.array([0, points // 2 - 1, points // 2, points - 1])
+
+    values = df['Value'].to_numpy(dtype=float)[picked]
+    changes = np.diff(values, axis=1)
+
+    if time_column in df.columns:
+        times = pd.to_datetime(df[time_column]).to_numpy().astype('datetime64[ms]').view(np.int64)
+        minutes = np.diff(times[picked], axis=1) / 60_000
+        minutes = np.where(minutes > 0, minutes, np.nan)
+    else:
+        minutes = READING_INTERVAL
+    rates = changes / minutes
+
+    # Context labels as categorical codes: one category per (type, segment)
+    type_codes, type_names = df['TransitionType'].factorize()
+    type_codes = np.repeat(type_codes[first_rows][:, None], len(SEGMENTS), axis=1)
+    context_codes = type_codes * len(SEGMENTS) + np.arange(len(SEGMENTS))
+    context_codes = np.where(type_codes >= 0, context_codes, -1)
+    categories = [f"({name}){segment}" for name in type_names for segment in SEGMENTS]
+
+    # Circuit and Month of the first row of each transition, once per segment
+    first_rows = np.repeat(first_rows, len(SEGMENTS))
+    return pd.DataFrame({
+        'Circuit': df['Circuit'].take(first_rows).reset_index(drop=True),
+        'Month': df['Month'].take(first_rows).reset_index(drop=True),
+        'Combined_Context': pd.Categorical.from_codes(context_codes.ravel(), categories=categories),
+        'Rate_of_Change': rates.ravel()
+    })
 
 def process_transitions(file_path):
-    # Read sheets
-    demand_df = pd.read_excel(file_path, sheet_name='Demand Transitions')
-    synced_df = pd.read_excel(file_path, sheet_name='Synced Transitions')
-    
-    def calculate_rates(df):
-        # Initialize lists for results
-        rates = []
-        circuits = []
-        months = []
-        contexts = []
-        
-        # Process in groups of 4 rows
-        for i in range(0, len(df), 4):
-            group = df.iloc[i:i+4]
-            if len(group) < 4:  # Skip incomplete groups
-                continue
-                
-            # Calculate rates for the sequence CB->TB->TA->CA
-            cb_to_tb = (group.iloc[1]['Value'] - group.iloc[0]['Value']) / 15
-            tb_to_ta = (group.iloc[2]['Value'] - group.iloc[1]['Value']) / 15
-            ta_to_ca = (group.iloc[3]['Value'] - group.iloc[2]['Value']) / 15
-            
-            # Append rates and metadata
-            rates.extend([cb_to_tb, tb_to_ta, ta_to_ca])
-            circuits.extend([group.iloc[0]['Circuit']] * 3)
-            months.extend([group.iloc[0]['Month']] * 3)
-            
-            # Create context labels
-            contexts.extend([
-                f"({group.iloc[0]['TransitionType']})CB-TB",
-                f"({group.iloc[1]['TransitionType']})TB-TA",
-                f"({group.iloc[2]['TransitionType']})TA-CA"
-            ])
-        
-        # Create result dataframe
-        result_df = pd.DataFrame({
-            'Circuit': circuits,
-            'Month': months,
-            'Combined_Context': contexts,
-            'Rate_of_Change': rates
-        })
-        
-        return result_df
+    # Read sheets (the workbook is parsed once)
+    sheets = read_workbook(file_path, ['Demand Transitions', 'Synced Transitions'])
+    demand_df = sheets['Demand Transitions']
+    synced_df = sheets['Synced Transitions']
     
     # Process both sheets
     demand_rates = calculate_rates(demand_df)
@@ -58,4 +124,5 @@ def process_transitions(file_path):
     return demand_rates, synced_rates
 
 # Usage
-rates_demand, rates_synced = process_transitions('DemandTransitions.xlsx')
+if __name__ == "__main__":
+    rates_demand, rates_synced = process_transitions('DemandTransitions.xlsx')
@@ -1,115 +1,318 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import os
+import sys
 
-def process_transitions(filename, sheet_names, column_name, include_demand_limit=False, include_synced_demand=False):
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PartitionedStore import read_month_sheets
+from ReportWriter import write_workbook
+
+# Month sheets of the input workbook
+SHEET_NAMES = ["April", "May", "June", "July", "August", "September", "October"]
+
+# The four transition analyses: the column whose changes are transitions, and
+# which other demand limit column is added to the transition type
+TRANSITION_ANALYSES = {
+    'Demand': {'column_name': 'DemandLimit'},
+    'Synced': {'column_name': 'SyncedDemandLimit'},
+    'Combined': {'column_name': 'SyncedDemandLimit', 'include_demand_limit': True},
+    'ReverseCombined': {'column_name': 'DemandLimit', 'include_synced_demand': True},
+}
+
+# Context points kept on each side of a transition, and the range swept by
+# sweep_context_points
+CONTEXT_POINTS = 1
+MAX_CONTEXT_POINTS = 8
+
+# Level columns compared across context sizes by save_context_sweep
+SWEEP_COLUMNS = {'Demand': 'DemandLimit', 'Synced': 'SyncedDemandLimit'}
+
+def row_types(context_points=CONTEXT_POINTS):
+    """Row markers of one transition: context rows, from, to, context rows."""
+    return ['Context Row'] * context_points + ['Transition From', 'Transition To'] + ['Context Row'] * context_points
+
+def load_sheets(filename, sheet_names):
     """
-    Process Excel sheets to identify transitions for a specific column.
+    Read all month sheets of the workbook, parsing it only once per run (and
+    reusing its columnar copy on later runs, see WorkbookCache.read_workbook).
+    filename may also be a partitioned store folder, in which case only the
+    partitions of the requested months are read.
+    
+    Returns:
+        dict: Sheet name -> DataFrame, in the order of sheet_names
+    """
+    return read_month_sheets(filename, sheet_names)
+
+def find_transition_indices(df, column_name, context_points=CONTEXT_POINTS):
+    """
+    Row positions where the column changes and the context points on both
+    sides agree with the 'from' and 'to' values.
+    
+    The level column is viewed as strided windows of context_points + 1 rows,
+    so every candidate transition is validated at once: the window ending at
+    the 'from' row and the window starting at the 'to' row must each hold a
+    single level. Missing levels never match.
     
     Args:
-        filename (str): Path to the Excel file
-        sheet_names (list): List of sheet names to process
+        df (pd.DataFrame): One month sheet
         column_name (str): Name of column to analyze for transitions
-        include_demand_limit (bool): Whether to include DemandLimit in transition type
-        include_synced_demand (bool): Whether to include SyncedDemandLimit in transition type
+        context_points (int): Context points required before the 'from' row
+            and after the 'to' row
     
     Returns:
-        tuple: (transitions_df, summary_df) containing the detailed transitions and summary analysis
+        np.ndarray: Positions of the 'Transition To' rows
     """
-    all_transitions = []
-    overall_transition_count = 1  # Global counter for all transitions
+    codes, _ = pd.factorize(df[column_name])
+    n = len(codes)
+    if n < 2 * context_points + 2:
+        return np.array([], dtype=np.int64)
     
-    for sheet in sheet_names:
-        # Read the sheet
-        df = pd.read_excel(filename, sheet_name=sheet)
+    changed = np.ones(n, dtype=bool)
+    changed[1:] = codes[1:] != codes[:-1]
+    
+    # Windows of context_points + 1 rows that hold a single (known) level
+    windows = sliding_window_view(codes, context_points + 1)
+    constant = (windows == windows[:, :1]).all(axis=1) & (windows[:, 0] >= 0)
+    
+    # Need the context points before the 'from' row and after the 'to' row
+    indices = np.flatnonzero(changed)
+    indices = indices[(indices >= context_points + 1) & (indices < n - context_points)]
+    
+    context_valid = constant[indices - context_points - 1] & constant[indices]
+    return indices[context_valid]
+
+def transition_table(df, column_name, context_points=CONTEXT_POINTS):
+    """
+    Compact table of the transitions in one sheet: one row per transition with
+    its levels and the Value of every row in its window.
+    
+    Args:
+        df (pd.DataFrame): One month sheet
+        column_name (str): Name of column to analyze for transitions
+        context_points (int): Context points on each side of the transition
+    
+    Returns:
+        pd.DataFrame: Position of the 'Transition To' row, FromLevel, ToLevel,
+        FromDate and ToDate, and Value-{context_points + 1} ... Value+{context_points}
+        (offsets from the 'Transition To' row, so Value-1 is the 'from' value
+        and Value+0 the 'to' value)
+    """
+    indices = find_transition_indices(df, column_name, context_points)
+    levels = df[column_name].to_numpy()
+    
+    table = pd.DataFrame({
+        'Position': indices,
+        'FromLevel': levels[indices - 1],
+        'ToLevel': levels[indices],
+    })
+    if 'Circuit' in df.columns:
+        table.insert(0, 'Circuit', df['Circuit'].to_numpy()[indices])
+    if 'Date' in df.columns:
+        table['FromDate'] = df['Date'].to_numpy()[indices - 1]
+        table['ToDate'] = df['Date'].to_numpy()[indices]
+    
+    # Value windows of 2 * context_points + 2 rows around every transition
+    width = 2 * context_points + 2
+    if len(df) >= width:
+        value_windows = sliding_window_view(df['Value'].to_numpy(dtype=float), width)[indices - context_points - 1]
+    else:
+        value_windows = np.empty((0, width))
+    for offset, values in zip(range(-context_points - 1, context_points + 1), value_windows.T):
+        table[f'Value{offset:+d}'] = values
+    
+    return table
+
+def sweep_context_points(sheets, column_name, max_context_points=MAX_CONTEXT_POINTS):
+    """
+    Number of transitions found in each sheet for every context size from 1 to
+    max_context_points, in one pass over each sheet.
+    
+    A transition is kept with k context points when the runs of its 'from' and
+    'to' levels are both at least k + 1 rows long, so the run lengths around
+    each change point give the largest k it is valid for.
+    
+    Args:
+        sheets (dict): Sheet name -> DataFrame (see load_sheets)
+        column_name (str): Name of column to analyze for transitions
+        max_context_points (int): Largest context size to count
+    
+    Returns:
+        pd.DataFrame: Sheet, ContextPoints and Transitions columns
+    """
+    context_range = np.arange(1, max_context_points + 1)
+    counts = []
+    
+    for sheet, df in sheets.items():
+        codes, _ = pd.factorize(df[column_name])
         
-        # Create a mask for where the specified column changes
-        transitions = df[column_name] != df[column_name].shift()
+        # Runs of the same level
+        run_starts = np.flatnonzero(np.diff(codes, prepend=-2) != 0)
+        run_lengths = np.diff(np.append(run_starts, len(codes)))
+        run_codes = codes[run_starts]
         
-        # Get indices where transitions occur
-        transition_indices = transitions[transitions].index.tolist()
+        # Largest context size of the transition between each pair of runs
+        known = (run_codes[:-1] >= 0) & (run_codes[1:] >= 0)
+        largest = np.minimum(run_lengths[:-1], run_lengths[1:])[known] - 1
         
-        # Keep track of transition number within each sheet
-        sheet_transition_count = 1
+        found = (largest[:, None] >= context_range).sum(axis=0)
+        counts.append(pd.DataFrame({'Sheet': sheet, 'ContextPoints': context_range, 'Transitions': found}))
+    
+    return pd.concat(counts, ignore_index=True)
+
+def transition_types(df, indices, column_name, include_demand_limit=False, include_synced_demand=False):
+    """
+    Transition type label for each transition (indices are the 'Transition To' rows).
+    """
+    from_values = df[column_name].to_numpy()[indices - 1]
+    to_values = df[column_name].to_numpy()[indices]
+    
+    if include_demand_limit:
+        # Include both SyncedDemandLimit and DemandLimit in transition type
+        from_demand = df['DemandLimit'].to_numpy()[indices - 1]
+        to_demand = df['DemandLimit'].to_numpy()[indices]
+        return [
+            f"Synced:{f}->{t} [DL:{fd}->{td}] "
+            f"(DL Status: {'Matches' if f == fd else 'Different'}->{'Matches' if t == td else 'Different'})"
+            for f, t, fd, td in zip(from_values, to_values, from_demand, to_demand)
+        ]
+    
+    if include_synced_demand:
+        # Include both DemandLimit and SyncedDemandLimit in transition type
+        from_synced = df['SyncedDemandLimit'].to_numpy()[indices - 1]
+        to_synced = df['SyncedDemandLimit'].to_numpy()[indices]
+        return [
+            f"DL:{f}->{t} [Synced:{fs}->{ts}] "
+            f"(Synced Status: {'Matches' if f == fs else 'Different'}->{'Matches' if t == ts else 'Different'})"
+            for f, t, fs, ts in zip(from_values, to_values, from_synced, to_synced)
+        ]
+    
+    return [f"{f} to {t}" for f, t in zip(from_values, to_values)]
+
+def transition_rows(df, indices, sheet, types, first_number, context_points=CONTEXT_POINTS):
+    """
+    The context, from, to and context rows of every transition in one sheet.
+    """
+    types_per_row = row_types(context_points)
+    offsets = np.arange(-context_points - 1, context_points + 1)
+    positions = (indices[:, None] + offsets).ravel()
+    rows = df.iloc[positions].copy()
+    rows['Sheet'] = sheet
+    rows['RowType'] = types_per_row * len(indices)
+    rows['TransitionType'] = np.repeat(np.asarray(types, dtype=object), len(types_per_row))
+    rows['GlobalTransitionNumber'] = np.repeat(np.arange(first_number, first_number + len(indices)), len(types_per_row))
+    rows['SheetTransitionNumber'] = np.repeat(np.arange(1, len(indices) + 1), len(types_per_row))
+    return rows
+
+def summarize_transitions(result_df, include_demand_limit=False, include_synced_demand=False):
+    """
+    Rate of change summary with one row per transition, from a single grouped
+    reduction over the transition rows.
+    
+    Args:
+        result_df (pd.DataFrame): Transition rows (sorted as they are saved)
+        include_demand_limit (bool): Report the DemandLimit of the from/to rows
+        include_synced_demand (bool): Report the SyncedDemandLimit of the from/to rows
+    
+    Returns:
+        pd.DataFrame: Summary in order of first appearance in result_df
+    """
+    # First row of each transition, and its from and to rows
+    firsts = result_df.drop_duplicates('GlobalTransitionNumber').set_index('GlobalTransitionNumber')
+    from_rows = (result_df[result_df['RowType'] == 'Transition From']
+                 .drop_duplicates('GlobalTransitionNumber').set_index('GlobalTransitionNumber'))
+    to_rows = (result_df[result_df['RowType'] == 'Transition To']
+               .drop_duplicates('GlobalTransitionNumber').set_index('GlobalTransitionNumber'))
+    
+    # Only transitions with both transition rows
+    numbers = firsts.index[firsts.index.isin(from_rows.index) & firsts.index.isin(to_rows.index)]
+    firsts, from_rows, to_rows = firsts.loc[numbers], from_rows.loc[numbers], to_rows.loc[numbers]
+    
+    def column(rows, name):
+        return rows[name].to_numpy() if name in rows.columns else np.full(len(numbers), None)
+    
+    first_value = column(from_rows, 'Value')
+    last_value = column(to_rows, 'Value')
+    absolute_change = last_value - first_value
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_change = np.where(first_value != 0, absolute_change / first_value * 100, float('inf'))
+    
+    if include_demand_limit:
+        from_dl, to_dl = from_rows['DemandLimit'].to_numpy(), to_rows['DemandLimit'].to_numpy()
+    elif include_synced_demand:
+        from_dl, to_dl = from_rows['SyncedDemandLimit'].to_numpy(), to_rows['SyncedDemandLimit'].to_numpy()
+    else:
+        from_dl = to_dl = None
+    
+    return pd.DataFrame({
+        'GlobalTransitionNumber': numbers.to_numpy(),
+        'Month': firsts['Sheet'].to_numpy(),
+        'Circuit': column(firsts, 'Circuit'),
+        'StartDate': column(from_rows, 'Date'),
+        'EndDate': column(to_rows, 'Date'),
+        'TransitionType': firsts['TransitionType'].to_numpy(),
+        'StartValue': first_value,
+        'EndValue': last_value,
+        'FromDemandLimit': from_dl,
+        'ToDemandLimit': to_dl,
+        'AbsoluteChange': absolute_change,
+        'RateOfChange': absolute_change / 15,  # Rate of change per minute
+        'PercentChange': percent_change
+    })
+
+def process_all_transitions(filename, sheet_names, analyses=TRANSITION_ANALYSES, sheets=None,
+                            context_points=CONTEXT_POINTS):
+    """
+    Run several transition analyses over the workbook in one pass.
+    
+    Every sheet is read once, and the transitions of each distinct column are
+    found once per sheet and shared by the analyses on that column.
+    
+    Args:
+        filename (str): Path to the Excel file
+        sheet_names (list): List of sheet names to process
+        analyses (dict): Analysis name -> process_transitions keyword arguments
+        sheets (dict, optional): Already loaded sheets (see load_sheets)
+        context_points (int): Context points on each side of a transition
+    
+    Returns:
+        dict: Analysis name -> (transitions_df, summary_df)
+    """
+    if sheets is None:
+        sheets = load_sheets(filename, sheet_names)
+    
+    all_transitions = {name: [] for name in analyses}
+    overall_transition_count = {name: 1 for name in analyses}  # Global counters for all transitions
+    
+    for sheet in sheet_names:
+        df = sheets[sheet]
         
-        # Process each transition
-        for idx in transition_indices:
-            # First, check if we have enough points before and after
-            if idx < 2 or idx >= len(df) - 1:
+        # Transitions of each column, shared by the analyses on that column
+        indices_by_column = {}
+        for options in analyses.values():
+            column_name = options['column_name']
+            if column_name not in indices_by_column:
+                indices_by_column[column_name] = find_transition_indices(df, column_name, context_points)
+        
+        for name, options in analyses.items():
+            indices = indices_by_column[options['column_name']]
+            if len(indices) == 0:
                 continue
-                
-            # Get all potential rows for this transition
-            pre_context_idx = idx - 2
-            from_idx = idx - 1
-            to_idx = idx
-            post_context_idx = idx + 1
-            
-            # Validate demand limit matching for context points
-            context_valid = True
-            
-            # Check if the pre-context point matches the 'from' transition point
-            if pre_context_idx >= 0:
-                pre_context_demand = df.iloc[pre_context_idx][column_name]
-                from_demand = df.iloc[from_idx][column_name]
-                if pre_context_demand != from_demand:
-                    context_valid = False
-            
-            # Check if the post-context point matches the 'to' transition point
-            if post_context_idx < len(df):
-                post_context_demand = df.iloc[post_context_idx][column_name]
-                to_demand = df.iloc[to_idx][column_name]
-                if post_context_demand != to_demand:
-                    context_valid = False
-            
-            # Only process if context is valid
-            if context_valid:
-                # Get the rows and add sheet name for reference
-                rows_to_include = [pre_context_idx, from_idx, to_idx, post_context_idx]
-                transition_rows = df.iloc[rows_to_include].copy()
-                transition_rows['Sheet'] = sheet
-                
-                # Add transition type and numbers
-                from_value = df.iloc[from_idx][column_name]
-                to_value = df.iloc[to_idx][column_name]
-                
-                if include_demand_limit:
-                    # Include both SyncedDemandLimit and DemandLimit in transition type
-                    from_demand = df.iloc[from_idx]['DemandLimit']
-                    to_demand = df.iloc[to_idx]['DemandLimit']
-                    
-                    # Check if SyncedDemandLimit matches DemandLimit at start and end points
-                    from_match = "Matches" if from_value == from_demand else "Different"
-                    to_match = "Matches" if to_value == to_demand else "Different"
-                    
-                    transition_type = f"Synced:{from_value}->{to_value} [DL:{from_demand}->{to_demand}] (DL Status: {from_match}->{to_match})"
-                
-                elif include_synced_demand:
-                    # Include both DemandLimit and SyncedDemandLimit in transition type
-                    from_synced = df.iloc[from_idx]['SyncedDemandLimit']
-                    to_synced = df.iloc[to_idx]['SyncedDemandLimit']
-                    
-                    # Check if DemandLimit matches SyncedDemandLimit at start and end points
-                    from_match = "Matches" if from_value == from_synced else "Different"
-                    to_match = "Matches" if to_value == to_synced else "Different"
-                    
-                    transition_type = f"DL:{from_value}->{to_value} [Synced:{from_synced}->{to_synced}] (Synced Status: {from_match}->{to_match})"
-                
-                else:
-                    transition_type = f"{from_value} to {to_value}"
-                
-                # Add row markers and transition info
-                transition_rows['RowType'] = ['Context Row', 'Transition From', 'Transition To', 'Context Row']
-                transition_rows['TransitionType'] = transition_type
-                transition_rows['GlobalTransitionNumber'] = overall_transition_count
-                transition_rows['SheetTransitionNumber'] = sheet_transition_count
-                
-                sheet_transition_count += 1
-                overall_transition_count += 1
-                
-                all_transitions.append(transition_rows)
+            types = transition_types(df, indices, **options)
+            all_transitions[name].append(
+                transition_rows(df, indices, sheet, types, overall_transition_count[name], context_points))
+            overall_transition_count[name] += len(indices)
     
-    # Combine all transitions into a single dataframe
-    if all_transitions:
-        result_df = pd.concat(all_transitions, ignore_index=True)
+    results = {}
+    for name, options in analyses.items():
+        if not all_transitions[name]:
+            results[name] = (pd.DataFrame(), pd.DataFrame())
+            continue
+        
+        # Combine all transitions into a single dataframe
+        result_df = pd.concat(all_transitions[name], ignore_index=True)
         
         # Sort by Sheet and Date
         sort_columns = ['Sheet']
@@ -118,60 +321,34 @@ def process_transitions(filename, sheet_names, column_name, include_demand_limit
         result_df.sort_values(sort_columns, inplace=True)
         
         # Create summary dataframe with rate of change analysis
-        summary_data = []
-        
-        for transition_num in result_df['GlobalTransitionNumber'].unique():
-            transition_data = result_df[result_df['GlobalTransitionNumber'] == transition_num]
-            
-            # Get transition rows only
-            from_row = transition_data[transition_data['RowType'] == 'Transition From']
-            to_row = transition_data[transition_data['RowType'] == 'Transition To']
-            
-            # Only process if we have both transition rows
-            if not from_row.empty and not to_row.empty:
-                first_value = from_row['Value'].values[0] if 'Value' in from_row.columns else None
-                last_value = to_row['Value'].values[0] if 'Value' in to_row.columns else None
-                
-                # Calculate changes only if we have valid values
-                if first_value is not None and last_value is not None:
-                    absolute_change = last_value - first_value
-                    rate_of_change = absolute_change / 15  # Rate of change per minute
-                    percent_change = (absolute_change / first_value) * 100 if first_value != 0 else float('inf')
-                else:
-                    absolute_change = None
-                    rate_of_change = None
-                    percent_change = None
-                
-                # Get demand limit values if needed
-                if include_demand_limit:
-                    from_dl = from_row['DemandLimit'].iloc[0]
-                    to_dl = to_row['DemandLimit'].iloc[0]
-                elif include_synced_demand:
-                    from_dl = from_row['SyncedDemandLimit'].iloc[0]
-                    to_dl = to_row['SyncedDemandLimit'].iloc[0]
-                else:
-                    from_dl = to_dl = None
-                
-                summary_data.append({
-                    'GlobalTransitionNumber': transition_num,
-                    'Month': transition_data['Sheet'].iloc[0],
-                    'Circuit': transition_data['Circuit'].iloc[0] if 'Circuit' in transition_data.columns else None,
-                    'StartDate': from_row['Date'].iloc[0] if 'Date' in from_row.columns else None,
-                    'EndDate': to_row['Date'].iloc[0] if 'Date' in to_row.columns else None,
-                    'TransitionType': transition_data['TransitionType'].iloc[0],
-                    'StartValue': first_value,
-                    'EndValue': last_value,
-                    'FromDemandLimit': from_dl if include_demand_limit or include_synced_demand else None,
-                    'ToDemandLimit': to_dl if include_demand_limit or include_synced_demand else None,
-                    'AbsoluteChange': absolute_change,
-                    'RateOfChange': rate_of_change,
-                    'PercentChange': percent_change
-                })
-        
-        summary_df = pd.DataFrame(summary_data)
-        return result_df, summary_df
-    else:
-        return pd.DataFrame(), pd.DataFrame()
+        summary_df = summarize_transitions(result_df,
+                                           options.get('include_demand_limit', False),
+                                           options.get('include_synced_demand', False))
+        results[name] = (result_df, summary_df)
+    
+    return results
+
+def process_transitions(filename, sheet_names, column_name, include_demand_limit=False, include_synced_demand=False,
+                        sheets=None, context_points=CONTEXT_POINTS):
+    """
+    Process Excel sheets to identify transitions for a specific column.
+    
+    Args:
+        filename (str): Path to the Excel file
+        sheet_names (list): List of sheet names to process
+        column_name (str): Name of column to analyze for transitions
+        include_demand_limit (bool): Whether to include DemandLimit in transition type
+        include_synced_demand (bool): Whether to include SyncedDemandLimit in transition type
+        sheets (dict, optional): Already loaded sheets (see load_sheets)
+        context_points (int): Context points on each side of a transition
+    
+    Returns:
+        tuple: (transitions_df, summary_df) containing the detailed transitions and summary analysis
+    """
+    options = {'column_name': column_name, 'include_demand_limit': include_demand_limit,
+               'include_synced_demand': include_synced_demand}
+    return process_all_transitions(filename, sheet_names, {'Transitions': options}, sheets,
+                                   context_points)['Transitions']
 
 def split_summary_by_change(summary_df, sheet_prefix):
     """
@@ -197,26 +374,69 @@ def split_summary_by_change(summary_df, sheet_prefix):
         return positive_df, negative_df
     return pd.DataFrame(), pd.DataFrame()
 
-def save_transitions(input_file, output_file):
+def save_context_sweep(input_file, output_file, sheet_names=SHEET_NAMES, max_context_points=MAX_CONTEXT_POINTS,
+                       sheets=None):
+    """
+    Save the transitions found with every context size from 1 to
+    max_context_points, from a single read of the workbook.
+    
+    The 'Counts' sheet has the number of transitions per month, level column
+    and context size (see sweep_context_points); '<Demand|Synced> k=<k>'
+    sheets have the compact transition table of each size (see
+    transition_table).
+    
+    Args:
+        input_file (str): Path to the Excel file
+        output_file (str): Path of the sweep workbook
+        sheet_names (list): List of sheet names to process
+        max_context_points (int): Largest context size
+        sheets (dict, optional): Already loaded sheets (see load_sheets)
+    """
+    if sheets is None:
+        sheets = load_sheets(input_file, sheet_names)
+    sheets = {sheet: sheets[sheet] for sheet in sheet_names}
+    
+    counts = [sweep_context_points(sheets, column_name, max_context_points).assign(Column=column_name)
+              for column_name in SWEEP_COLUMNS.values()]
+    counts = pd.concat(counts, ignore_index=True)
+    report = {'Counts': counts[['Sheet', 'Column', 'ContextPoints', 'Transitions']]}
+    
+    for name, column_name in SWEEP_COLUMNS.items():
+        for context_points in range(1, max_context_points + 1):
+            tables = [transition_table(df, column_name, context_points).assign(Sheet=sheet)
+                      for sheet, df in sheets.items()]
+            table = pd.concat(tables, ignore_index=True)
+            report[f'{name} k={context_points}'] = table[['Sheet'] + list(table.columns[:-1])]
+    
+    write_workbook(report, output_file)
+    print(f"Saved transitions for context sizes 1 to {max_context_points} to {output_file}")
+
+def save_transitions(input_file, output_file, context_points=CONTEXT_POINTS, sweep_file=None,
+                     max_context_points=MAX_CONTEXT_POINTS):
     """
     Process the input Excel file and save transitions to a new Excel file with multiple sheets.
+    
+    Args:
+        input_file (str): Path to the Excel file
+        output_file (str): Path of the transitions workbook
+        context_points (int): Context points on each side of a transition
+        sweep_file (str, optional): Also save the transitions of every context
+            size up to max_context_points here (see save_context_sweep)
+        max_context_points (int): Largest context size of the sweep
     """
     # Define sheet names
-    sheets = ["April", "May", "June", "July", "August", "September", "October"]
+    sheets = SHEET_NAMES
     
     try:
-        # Process all types of transitions
-        # Original analyses
-        demand_transitions_df, demand_summary_df = process_transitions(
-            input_file, sheets, 'DemandLimit')
-        synced_transitions_df, synced_summary_df = process_transitions(
-            input_file, sheets, 'SyncedDemandLimit')
-        combined_transitions_df, combined_summary_df = process_transitions(
-            input_file, sheets, 'SyncedDemandLimit', include_demand_limit=True)
+        # Process all types of transitions from a single read of the workbook
+        loaded = load_sheets(input_file, sheets)
+        results = process_all_transitions(input_file, sheets, sheets=loaded, context_points=context_points)
+        demand_transitions_df, demand_summary_df = results['Demand']
+        synced_transitions_df, synced_summary_df = results['Synced']
+        combined_transitions_df, combined_summary_df = results['Combined']
         
-        # New analysis: DemandLimit transitions with SyncedDemandLimit matching
-        reverse_combined_transitions_df, reverse_combined_summary_df = process_transitions(
-            input_file, sheets, 'DemandLimit', include_synced_demand=True)
+        # DemandLimit transitions with SyncedDemandLimit matching
+        reverse_combined_transitions_df, reverse_combined_summary_df = results['ReverseCombined']
         
         # Split summaries into positive and negative changes
         demand_pos, demand_neg = split_summary_by_change(demand_summary_df, "Demand")
@@ -283,6 +503,9 @@ def save_transitions(input_file, output_file):
                             print(f"  - {t_type}")
             else:
                 print(f"\nNo {transition_type} transitions found")
+        
+        if sweep_file is not None:
+            save_context_sweep(input_file, sweep_file, sheets, max_context_points, sheets=loaded)
             
     except FileNotFoundError:
         print(f"Error: Could not find the input file {input_file}")
@@ -296,4 +519,5 @@ def save_transitions(input_file, output_file):
 if __name__ == "__main__":
     input_file = "ATestByMonth.xlsx"
     output_file = "DemandTransitions.xlsx"
-    save_transitions(input_file, output_file)
+    sweep_file = "TransitionContextSweep.xlsx"
+    save_transitions(input_file, output_file, sweep_file=sweep_file)
@@ -1,52 +1,12 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-
-# Replace 'path_to_your_file' with the actual file path if it's not in the same directory.
-file_path = 'ATest.csv'
-
-# Load the CSV file into a DataFrame
-df = pd.read_csv(file_path)
-
-# List to store each subset of transitions (from non-D0 to D0)
-transitions = []
-
-# Temporary list to store consecutive non-D0 entries
-non_D0_entries = []
-
-# Iterate through each row of the DataFrame
-for index, row in df.iterrows():
-    # Check if the DemandLimit is not equal to D0
-    if row['DemandLimit'] != 'D0':
-        # Append the row to the list of non-D0 entries
-        non_D0_entries.append(row)
-    else:
-        # If DemandLimit equals D0 and we have collected non-D0 entries
-        if non_D0_entries:
-            # Create a DataFrame from the list of non-D0 entries and store it as a transition
-            transition_df = pd.DataFrame(non_D0_entries)
-            transitions.append(transition_df)
-            
-            # Clear the list for the next set of non-D0 entries
-            non_D0_entries = []
-
-# If there are still non-D0 entries at the end, add them as the final transition
-if non_D0_entries:
-    transition_df = pd.DataFrame(non_D0_entries)
-    transitions.append(transition_df)
-
-# Function to find the "last_limit" by moving up in the rows
-def find_last_limit(transition, j, current_limit):
-    for k in range(j-1, -1, -1):
-        if transition.iloc[k]['DemandLimit'] != current_limit:
-            return transition.iloc[k]['DemandLimit']
-    return 'D0'  # If no earlier different limit is found, assume 'D0'
-
-# Function to find the "next_limit" by moving down in the rows
-def find_next_limit(transition, j, current_limit):
-    for k in range(j+1, len(transition)):
-        if transition.iloc[k]['DemandLimit'] != current_limit:
-            return transition.iloc[k]['DemandLimit']
-    return 'D0'  # If no later different limit is found, assume 'D0'
+from datetime import timedelta
+
+from DatasetCache import load_demand_dataset
+from DemandSchema import level_codes, level_labels
+
+# Load the classified dataset (ATest) from its cache
+df = load_demand_dataset()
 
 # Function to determine the direction based on last, current, and next limits
 def determine_direction(last_limit, current_limit, next_limit):
@@ -76,181 +36,148 @@ def determine_direction(last_limit, current_limit, next_limit):
     
     return None  # Return None if no change is detected
 
+# Demand limits in code order (DemandSchema.level_codes)
+LIMIT_ORDER = ['D0', 'D1', 'D2', 'D3']
+
+# Directions reported in the duration statistics
+DIRECTIONS = ['D1 Peak', 'D1 Rising', 'D1 Falling', 'D1 Catch',
+              'D2 Peak', 'D2 Rising', 'D2 Falling', 'D2 Catch', 'D3 Peak']
+
+# determine_direction for every (last, current, next) combination of limit codes
+DIRECTION_LOOKUP = np.array([[[determine_direction(last, current, following) for following in LIMIT_ORDER]
+                              for current in LIMIT_ORDER]
+                             for last in LIMIT_ORDER], dtype=object)
+
+def label_directions(df):
+    """
+    Split the data into transitions (consecutive non-D0 rows) and label every
+    row in them with its last limit, next limit and direction.
+
+    The last and next limits are the limits of the previous and next run of a
+    different limit within the same transition ('D0' at the transition edges),
+    so they come from run-length IDs and shifts instead of scanning rows.
+    Rows whose (last, current, next) limits have no direction keep the
+    direction of the row before them in the transition.
+
+    Args:
+        df (pd.DataFrame): Classified dataset in row order
+
+    Returns:
+        pd.DataFrame: The rows inside transitions with Transition (0-based),
+        Row (0-based position in the transition), LastLimit, NextLimit and
+        Direction columns added
+    """
+    codes = level_codes(df['DemandLimit'])
+
+    # Transitions are maximal runs of non-D0 rows
+    in_transition = codes != 0
+    starts = in_transition & ~np.concatenate(([False], in_transition[:-1]))
+    positions = np.flatnonzero(in_transition)
+    transition = np.cumsum(starts)[positions] - 1
+    current = codes[positions]
+
+    # Runs of the same limit inside each transition
+    new_transition = np.ones(len(positions), dtype=bool)
+    new_transition[1:] = transition[1:] != transition[:-1]
+    run_start = new_transition.copy()
+    run_start[1:] |= current[1:] != current[:-1]
+    run = np.cumsum(run_start) - 1
+    run_codes = current[run_start]
+    run_transition = transition[run_start]
+
+    # Limit of the previous and next run in the same transition, D0 at the edges
+    previous_run = np.zeros(len(run_codes), dtype=np.int8)
+    previous_run[1:] = np.where(run_transition[1:] == run_transition[:-1], run_codes[:-1], 0)
+    next_run = np.zeros(len(run_codes), dtype=np.int8)
+    next_run[:-1] = np.where(run_transition[:-1] == run_transition[1:], run_codes[1:], 0)
+    last = previous_run[run]
+    following = next_run[run]
+
+    # Direction lookup; rows without a direction keep the previous one
+    known = (last >= 0) & (current >= 0) & (following >= 0)
+    direction = np.full(len(positions), None, dtype=object)
+    direction[known] = DIRECTION_LOOKUP[last[known], current[known], following[known]]
+    direction = pd.Series(direction).groupby(transition).ffill()
+
+    rows = df.iloc[positions].copy()
+    rows['Transition'] = transition
+    rows['Row'] = np.arange(len(positions)) - np.flatnonzero(new_transition)[transition]
+    rows['LastLimit'] = level_labels(last)
+    rows['NextLimit'] = level_labels(following)
+    rows['Direction'] = direction.to_numpy()
+    return rows
+
+def transition_table(rows):
+    """
+    One row per transition (Circuit, Month and Day of its first row).
+    """
+    return rows.loc[rows['Row'] == 0, ['Circuit', 'Month', 'Day']].reset_index(drop=True)
+
+rows = label_directions(df)
+transitions = transition_table(rows)
+
+# Duration counters: 15 minutes per row at each limit and direction
+limit_durations = {
+    "D1": ['D1'],
+    "D2": ['D2'],
+    "D3": ['D3'],
+    "D1_or_above": ['D1', 'D2', 'D3'],
+    "D2_and_above": ['D2', 'D3'],
+}
+direction_durations = {
+    "D1_rising": 'D1 Rising',
+    "D1_peak": 'D1 Peak',
+    "D1_falling": 'D1 Falling',
+    "D1_catch": 'D1 Catch',
+    "D2_rising": 'D2 Rising',
+    "D2_peak": 'D2 Peak',
+    "D2_falling": 'D2 Falling',
+    "D2_catch": 'D2 Catch',
+    "D3_peak": 'D3 Peak',
+}
+limit_counts = pd.crosstab(rows['Transition'], rows['DemandLimit']).reindex(
+    index=transitions.index, columns=LIMIT_ORDER, fill_value=0)
+direction_counts = pd.crosstab(rows['Transition'], rows['Direction']).reindex(
+    index=transitions.index, columns=DIRECTIONS, fill_value=0)
+
+durations = pd.DataFrame({key: limit_counts[limits].sum(axis=1) for key, limits in limit_durations.items()})
+for key, direction in direction_durations.items():
+    durations[key] = direction_counts[direction]
+durations = durations * 15
+
+# Text of every row in the transitions
+date_time = rows['Date'].dt.strftime('%Y-%m-%d %H:%M')
+row_text = (
+    "Row " + (rows['Row'] + 1).astype(str) + " in Transition " + (rows['Transition'] + 1).astype(str) + ":\n"
+    + "  DateTime: " + date_time + "\n"
+    + "  Circuit: " + rows['Circuit'].astype(str) + "\n"
+    + "  Last Limit: " + rows['LastLimit'].astype(str) + "\n"
+    + "  Current Limit: " + rows['DemandLimit'].astype(str) + "\n"
+    + "  Next Limit: " + rows['NextLimit'].astype(str) + "\n"
+    + "  Value: " + rows['Value'].map(str) + "\n"
+    + "  Direction: " + rows['Direction'].fillna('None').astype(str) + "\n"
+)
+
 # Open a text file for writing
 with open('transition_limits_report.txt', 'w') as file:
-    # Process each transition and identify the limits
-    for i, transition in enumerate(transitions):
-        # Get the end time (first D0 entry after the transition)
-        end_time = None
-        for idx in range(transition.index[-1] + 1, len(df)):
-            if df.iloc[idx]['DemandLimit'] == 'D0':
-                end_row = df.iloc[idx]
-                end_time = datetime(int(end_row['Year']), int(end_row['Month']), 
-                                    int(end_row['Day']), int(end_row['Hour']), 
-                                    int(end_row['Minute']))
-                break
-
-        # Get the start time (last D0 entry before the transition)
-        start_time = None
-        for idx in range(transition.index[0] - 1, -1, -1):
-            if df.iloc[idx]['DemandLimit'] == 'D0':
-                start_row = df.iloc[idx]
-                start_time = datetime(int(start_row['Year']), int(start_row['Month']), 
-                                      int(start_row['Day']), int(start_row['Hour']), 
-                                      int(start_row['Minute']))
-                break
-
-        # Calculate the duration of the transition
-        if start_time and end_time:
-            total_duration = end_time - start_time
-        else:
-            total_duration = None
-        
-        # ---------------- New Snippet Starts Here ----------------
-        # Initialize duration counters
-        durations = {
-            "D1": timedelta(0),
-            "D2": timedelta(0),
-            "D3": timedelta(0),
-            "D1_or_above": timedelta(0),
-            "D2_and_above": timedelta(0),
-            "D1_rising": timedelta(0),
-            "D1_peak": timedelta(0),
-            "D1_falling": timedelta(0),
-            "D1_catch": timedelta(0),
-            "D2_rising": timedelta(0),
-            "D2_peak": timedelta(0),
-            "D2_falling": timedelta(0),
-            "D2_catch": timedelta(0),
-            "D3_peak": timedelta(0),
-        }
-        # ---------------- New Snippet Ends Here ----------------
-
-        # Iterate over each row in the transition and identify the limits
-        last_timestamp = None
-        previous_direction = None  # To store the last known direction
-        for j in range(len(transition)):
-            # Get current_limit from the current row
-            current_limit = transition.iloc[j]['DemandLimit']
-            
-            # Find last_limit (moving upwards if necessary)
-            last_limit = find_last_limit(transition, j, current_limit)
-            
-            # Find next_limit (moving downwards if necessary)
-            next_limit = find_next_limit(transition, j, current_limit)
-            
-            # Combine Month, Day, Hour, and Minute into a single datetime string
-            month = int(transition.iloc[j]['Month'])
-            day = int(transition.iloc[j]['Day'])
-            hour = int(transition.iloc[j]['Hour'])
-            minute = int(transition.iloc[j]['Minute'])
-            date_time = datetime(2024, month, day, hour, minute)
-            
-            # Get the value from the 'Value' column
-            value = transition.iloc[j]['Value']
-            
-            # Determine direction
-            direction = determine_direction(last_limit, current_limit, next_limit)
-            
-            # If direction is None, keep the previous direction
-            if direction is None:
-                direction = previous_direction
-            
-            # Update previous_direction to the current direction
-            previous_direction = direction
-            
-            # ---------------- New Snippet Starts Here ----------------
-            # Add 15 minutes to the duration counters based on the current limit and direction
-            duration_increment = timedelta(minutes=15)
-
-            if current_limit == 'D1':
-                durations["D1"] += duration_increment
-                durations["D1_or_above"] += duration_increment
-            elif current_limit == 'D2':
-                durations["D2"] += duration_increment
-                durations["D1_or_above"] += duration_increment
-                durations["D2_and_above"] += duration_increment
-            elif current_limit == 'D3':
-                durations["D3"] += duration_increment
-                durations["D1_or_above"] += duration_increment
-                durations["D2_and_above"] += duration_increment
-
-            # Update durations based on direction
-            if direction == 'D1 Rising':
-                durations["D1_rising"] += duration_increment
-            elif direction == 'D1 Peak':
-                durations["D1_peak"] += duration_increment
-            elif direction == 'D1 Falling':
-                durations["D1_falling"] += duration_increment
-            elif direction == 'D1 Catch':
-                durations["D1_catch"] += duration_increment
-            elif direction == 'D2 Rising':
-                durations["D2_rising"] += duration_increment
-            elif direction == 'D2 Peak':
-                durations["D2_peak"] += duration_increment
-            elif direction == 'D2 Falling':
-                durations["D2_falling"] += duration_increment
-            elif direction == 'D2 Catch':
-                durations["D2_catch"] += duration_increment
-            elif direction == 'D3 Peak':
-                durations["D3_peak"] += duration_increment
-
-              # Assign the direction to the row
-            transition.at[index, 'Direction'] = direction
-            # ---------------- New Snippet Ends Here ----------------
-
-            # Prepare the output text for each row
-            output = (
-                f"Row {j+1} in Transition {i+1}:\n"
-                f"  DateTime: {date_time.strftime('%Y-%m-%d %H:%M')}\n"
-                f"  Circuit: {transition.iloc[j]['Circuit']}\n"
-                f"  Last Limit: {last_limit}\n"
-                f"  Current Limit: {current_limit}\n"
-                f"  Next Limit: {next_limit}\n"
-                f"  Value: {value}\n"
-                f"  Direction: {direction}\n"
-            )
-            
-            # Write the output to the text file
-            file.write(output)
-
-            # Update the last timestamp to the current date_time
-            last_timestamp = date_time
-        
+    for i, text in enumerate(row_text.groupby(rows['Transition'].to_numpy()).agg(''.join)):
+        file.write(text)
+
         # Write the durations to the file
         file.write(f"Durations for Transition {i+1}:\n")
-        for key, duration in durations.items():
-            file.write(f"  Duration at {key}: {duration}\n")
+        for key, minutes in durations.iloc[i].items():
+            file.write(f"  Duration at {key}: {timedelta(minutes=int(minutes))}\n")
 
 
 # New Section for Summary Statistics
-# Initialize summary statistics
 total_transitions = len(transitions)
-circuit_transitions = {}
-monthly_transitions = {}
-daily_transitions = set()
-
-# Loop through each transition to calculate statistics
-for transition in transitions:
-    # Get the circuit from the first row of the transition
-    circuit = transition.iloc[0]['Circuit']
-    circuit_transitions[circuit] = circuit_transitions.get(circuit, 0) + 1
-    
-    # Get the month from the first row of the transition
-    month = transition.iloc[0]['Month']
-    monthly_transitions[month] = monthly_transitions.get(month, 0) + 1
-    
-    # Add the days to the set of daily transitions
-    for _, row in transition.iterrows():
-        day = (row['Month'], row['Day'])  # Tuple of (Month, Day)
-        daily_transitions.add(day)
-
-# Summation of days with at least 1 transition in each month
-days_with_transitions_per_month = {month: 0 for month in monthly_transitions.keys()}
-for month, count in monthly_transitions.items():
-    days_with_transitions_per_month[month] = len(set(day for (m, d) in daily_transitions if m == month))
+circuit_transitions = transitions.groupby('Circuit', sort=False).size()
+monthly_transitions = transitions.groupby('Month', sort=False).size()
 
-# Total unique days with at least one transition
+# Days (Month, Day) with at least one transition row
+daily_transitions = rows[['Month', 'Day']].drop_duplicates()
+days_with_transitions_per_month = daily_transitions.groupby('Month').size().reindex(
+    monthly_transitions.index, fill_value=0)
 total_unique_days_with_transitions = len(daily_transitions)
 
 # Write summary statistics to the same text file
@@ -269,61 +196,32 @@ with open('transition_limits_report.txt', 'a') as file:  # Append mode
     file.write(f"Total Unique Days with Transitions: {total_unique_days_with_transitions}\n")
 
 
-# Initialize dictionaries to store total durations and counts
-day_durations = {}
-month_durations = {}
-overall_durations = {'D1 Peak': 0, 'D1 Rising': 0, 'D1 Falling': 0, 'D1 Catch': 0,
-                     'D2 Peak': 0, 'D2 Rising': 0, 'D2 Falling': 0, 'D2 Catch': 0,
-                     'D3 Peak': 0, 'Total Count': 0}
+# Average time per direction over every row with a direction, grouped by a
+# key of the transition the rows belong to
+def calculate_averages(transition_keys):
+    # Keys in order of first appearance
+    key_codes = {}
+    for key in transition_keys:
+        key_codes.setdefault(key, len(key_codes))
+    row_codes = np.array([key_codes[key] for key in transition_keys], dtype=np.int64)[rows['Transition'].to_numpy()]
+
+    # Rows per key and direction
+    direction_codes = pd.Categorical(rows['Direction'], categories=DIRECTIONS).codes
+    has_direction = direction_codes >= 0
+    counts = np.zeros((len(key_codes), len(DIRECTIONS)), dtype=np.int64)
+    np.add.at(counts, (row_codes[has_direction], direction_codes[has_direction]), 1)
 
-# Loop through each transition to calculate statistics
-for transition in transitions:
-    # Get the date (unique day) and month
-    day = (transition.iloc[0]['Month'], transition.iloc[0]['Day'])
-    month = transition.iloc[0]['Month']
-    
-    # Initialize day and month keys if they don't exist
-    if day not in day_durations:
-        day_durations[day] = {'D1 Peak': 0, 'D1 Rising': 0, 'D1 Falling': 0, 'D1 Catch': 0,
-                              'D2 Peak': 0, 'D2 Rising': 0, 'D2 Falling': 0, 'D2 Catch': 0,
-                              'D3 Peak': 0, 'Count': 0}
-    if month not in month_durations:
-        month_durations[month] = {'D1 Peak': 0, 'D1 Rising': 0, 'D1 Falling': 0, 'D1 Catch': 0,
-                                  'D2 Peak': 0, 'D2 Rising': 0, 'D2 Falling': 0, 'D2 Catch': 0,
-                                  'D3 Peak': 0, 'Count': 0}
-    
-    # Iterate over each row in the transition and update durations for the day, month, and overall
-    for index, row in transition.iterrows():
-        direction = row['Direction']
-        duration = 15  # Each occurrence counts for 15 minutes
-        
-        # Update day, month, and overall durations based on the direction
-        if direction in day_durations[day]:
-            day_durations[day][direction] += duration
-            day_durations[day]['Count'] += 1
-        if direction in month_durations[month]:
-            month_durations[month][direction] += duration
-            month_durations[month]['Count'] += 1
-        if direction in overall_durations:
-            overall_durations[direction] += duration
-            overall_durations['Total Count'] += 1
-
-# Calculate averages for each unique day, month, and overall
-def calculate_averages(durations_dict):
     averages = {}
-    for key, value in durations_dict.items():
-        averages[key] = {}
-        for transition, total_duration in value.items():
-            if transition != 'Count':
-                avg_duration = total_duration / value['Count'] if value['Count'] > 0 else 0
-                averages[key][transition] = avg_duration
+    for key, key_counts in zip(key_codes, counts.tolist()):
+        count = sum(key_counts)
+        averages[key] = {direction: (rows_at * 15 / count if count > 0 else 0)
+                         for direction, rows_at in zip(DIRECTIONS, key_counts)}
     return averages
 
 # Calculate averages for unique days, months, and overall
-day_averages = calculate_averages(day_durations)
-month_averages = calculate_averages(month_durations)
-overall_averages = {k: (v / overall_durations['Total Count'] if overall_durations['Total Count'] > 0 else 0)
-                    for k, v in overall_durations.items() if k != 'Total Count'}
+day_averages = calculate_averages(list(zip(transitions['Month'].tolist(), transitions['Day'].tolist())))
+month_averages = calculate_averages(transitions['Month'].tolist())
+overall_averages = calculate_averages(['Overall'] * total_transitions).get('Overall', {})
 
 # Write the average statistics to the text file
 with open('transition_limits_report.txt', 'a') as file:  # Append mode
@@ -0,0 +1,33 @@
+import ast
+import os
+
+# Shared modules live in the repository root; scripts in the subfolders add it
+# to sys.path and import them by name
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def code_dependencies(script):
+    """
+    The script and the root modules it imports, directly or through other
+    root modules (including imports inside functions), as relative paths.
+    """
+    seen, pending = set(), [script]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(os.path.join(ROOT, path), encoding='utf-8') as handle:
+            tree = ast.parse(handle.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = name.split('.')[0] + '.py'
+                if os.path.exists(os.path.join(ROOT, module)):
+                    pending.append(module)
+    return sorted(seen)
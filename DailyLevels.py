@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from DemandLimits import LEVELS
+from DemandSchema import level_codes
+
+
+def daily_levels(df, time_column='Date', level_column='DemandLimit'):
+    """
+    Highest demand limit of each circuit on each day, and which limits were
+    reached, from a single grouped pass over the readings.
+
+    Args:
+        df (pd.DataFrame): Classified readings with Circuit, time_column and
+            level_column columns
+        time_column (str): Timestamps; days are local calendar days
+        level_column (str): DemandLimit labels ('D0'-'D3')
+
+    Returns:
+        pd.DataFrame: Indexed by day (midnight timestamps, in order), with
+        columns (field, circuit): 'MaxLevel' holds the highest level code
+        reached (0 == D0 ... 3 == D3, -1 when no reading had a level), and
+        'D0'-'D3' whether that level was reached. Each circuit adds one column
+        per field.
+    """
+    dates = pd.to_datetime(df[time_column])
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_localize(None)  # Local wall-clock days
+    days = dates.dt.normalize().rename('Day')
+
+    codes = level_codes(df[level_column])
+    readings = pd.DataFrame({'MaxLevel': codes}, index=df.index)
+    for code, level in enumerate(LEVELS):
+        readings[level] = codes == code
+
+    # Max of the flags is 'any'
+    grouped = readings.groupby([days, df['Circuit'].rename('Circuit')], observed=True, sort=True).max()
+
+    fields = {'MaxLevel': grouped['MaxLevel'].unstack('Circuit', fill_value=-1)}
+    for level in LEVELS:
+        fields[level] = grouped[level].unstack('Circuit', fill_value=False)
+    return pd.concat(fields, axis=1)
+
+
+def level_days(levels, circuits=None, level=None):
+    """
+    Days with a demand limit above D0, as Month, Day and DemandLimit rows.
+
+    Without level, each day's DemandLimit is the highest one reached by any of
+    the circuits. With level, the days on which any of the circuits reached
+    that level are listed (with that level).
+
+    Args:
+        levels (pd.DataFrame): Table from daily_levels
+        circuits (list): Circuits to combine (default: all)
+        level (str): 'D1', 'D2' or 'D3' (default: highest level)
+
+    Returns:
+        pd.DataFrame: Month, Day and DemandLimit per day, in day order
+    """
+    if circuits is None:
+        circuits = levels['MaxLevel'].columns
+    circuits = list(circuits)
+
+    if level is None:
+        highest = levels['MaxLevel'][circuits].max(axis=1)
+        highest = highest[highest > 0]
+        days = highest.index
+        limits = LEVELS[highest.to_numpy().astype(int)]
+    else:
+        reached = levels[level][circuits].any(axis=1)
+        days = reached.index[reached.to_numpy()]
+        limits = np.full(len(days), level, dtype=object)
+
+    return pd.DataFrame({'Month': days.month, 'Day': days.day, 'DemandLimit': limits})
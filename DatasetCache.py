@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from DemandLimits import assign_demand_limits
+from DemandSchema import from_compact, to_compact
+from FeedIngest import FEED_ARCHIVES, read_feed_archives
+from Thresholds import apply_thresholds, load_thresholds
+
+# All default paths are relative to the repository root, so scripts in the
+# dated sub-folders find the same inputs and cache
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+THRESHOLD_FILE = '2024 Thresholds.xlsx'
+CACHE_FILE = 'ATest.parquet'
+
+# Months of the demand response season that are classified
+DEMAND_MONTHS = [4, 5, 6, 7, 8, 9, 10]
+
+# Bump when the way the dataset is built changes, so old caches are rebuilt
+CACHE_VERSION = 3
+
+
+def _data_path(path):
+    return path if os.path.isabs(path) else os.path.join(DATA_DIR, path)
+
+
+def source_fingerprint(paths, block_size=1 << 20):
+    """
+    SHA-256 over the contents of the input files (and the cache version).
+    """
+    digest = hashlib.sha256(f"version={CACHE_VERSION}".encode())
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(block_size), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def build_demand_dataset(feed_archives=FEED_ARCHIVES, threshold_file=THRESHOLD_FILE,
+                         months=DEMAND_MONTHS):
+    """
+    Build the classified demand dataset (the contents of ATest.csv) from the
+    raw feed archives and the threshold table.
+    """
+    df = read_feed_archives([_data_path(path) for path in feed_archives])
+
+    # Set Buffer, D1Limit, D2Limit and D3Limit for each (Circuit, Year, Month)
+    df = apply_thresholds(df, load_thresholds(_data_path(threshold_file)))
+
+    # Meter log rows ('Log Enabled', ...) carry no reading; leave them out so
+    # they are not classified as D0 and cannot split or end a demand episode
+    df = df[df['Month'].isin(months) & df['Value'].notna()].reset_index(drop=True)
+
+    # Assign DemandLimit per circuit with the buffer hysteresis rules
+    df['DemandLimit'] = assign_demand_limits(df)
+    return df
+
+
+def load_demand_dataset(cache_file=CACHE_FILE, feed_archives=FEED_ARCHIVES,
+                        threshold_file=THRESHOLD_FILE, rebuild=False, compact=False):
+    """
+    Load the classified demand dataset from its Parquet cache.
+
+    The cache is keyed by a hash of the feed archives and the threshold table;
+    it is rebuilt (and rewritten) only when one of them has changed, when it
+    does not exist yet, or when rebuild is True. The cache holds the compact
+    schema from DemandSchema.py.
+
+    Args:
+        cache_file (str): Path of the Parquet cache
+        feed_archives (list): Raw feed archives the dataset is built from
+        threshold_file (str): Threshold table the dataset is built from
+        rebuild (bool): Force a rebuild
+        compact (bool): Return the compact schema instead of the ATest layout
+
+    Returns:
+        pd.DataFrame: Classified dataset with typed columns (tz-aware Date)
+    """
+    cache_file = _data_path(cache_file)
+    fingerprint_file = cache_file + '.json'
+    sources = [_data_path(path) for path in feed_archives] + [_data_path(threshold_file)]
+    fingerprint = source_fingerprint(sources)
+
+    if not rebuild and os.path.exists(cache_file) and os.path.exists(fingerprint_file):
+        with open(fingerprint_file) as handle:
+            cached = json.load(handle).get('fingerprint') == fingerprint
+        if cached:
+            df = pd.read_parquet(cache_file)
+            return df if compact else from_compact(df)
+
+    df = to_compact(build_demand_dataset(feed_archives, threshold_file))
+    df.to_parquet(cache_file, index=False)
+    with open(fingerprint_file, 'w') as handle:
+        json.dump({'fingerprint': fingerprint,
+                   'sources': [os.path.basename(path) for path in sources]}, handle, indent=2)
+    return df if compact else from_compact(df)
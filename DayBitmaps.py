@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from DailyLevels import daily_levels
+
+# Levels above D0; a day 'Exceeded' D0 when any of them was reached
+LIMIT_LEVELS = ['D1', 'D2', 'D3']
+
+# Days are bit positions (bit i == i-th day of the day index), so a set of days
+# is a Python int: & is 'both', | is 'either', a & ~b is 'a but not b', and
+# int.bit_count() counts the days, whatever the number of days or circuits.
+
+
+def to_bitmap(flags):
+    """Boolean day flags to a bitmap (bit i set when flags[i])."""
+    packed = np.packbits(np.asarray(flags, dtype=bool), bitorder='little')
+    return int.from_bytes(packed.tobytes(), 'little')
+
+
+def bitmap_positions(bitmap):
+    """Positions of the set bits of a bitmap, in order."""
+    if bitmap == 0:
+        return np.empty(0, dtype=int)
+    packed = np.frombuffer(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, bitorder='little'))
+
+
+def day_bitmaps(df=None, levels=None):
+    """
+    Bitmap of the days each circuit reached each level.
+
+    Args:
+        df (pd.DataFrame): Classified readings (see DailyLevels.daily_levels)
+        levels (pd.DataFrame): Table from daily_levels, used instead of df
+
+    Returns:
+        tuple: (days, bitmaps) where days is the day index (bit i is days[i])
+        and bitmaps maps (circuit, level) to a bitmap, for levels 'D0'-'D3'
+        and 'Exceeded' (any of D1-D3)
+    """
+    if levels is None:
+        levels = daily_levels(df)
+
+    bitmaps = {}
+    for circuit in levels['MaxLevel'].columns:
+        for level in ['D0'] + LIMIT_LEVELS:
+            bitmaps[(circuit, level)] = to_bitmap(levels[level][circuit].to_numpy())
+        bitmaps[(circuit, 'Exceeded')] = to_bitmap(levels['MaxLevel'][circuit].to_numpy() > 0)
+    return levels.index, bitmaps
+
+
+def union(bitmaps):
+    """Days in any of the bitmaps."""
+    result = 0
+    for bitmap in bitmaps:
+        result |= bitmap
+    return result
+
+
+def intersection(bitmaps):
+    """Days in all of the bitmaps."""
+    bitmaps = list(bitmaps)
+    result = bitmaps[0] if bitmaps else 0
+    for bitmap in bitmaps[1:]:
+        result &= bitmap
+    return result
+
+
+def only(bitmap, others):
+    """Days in bitmap and in none of the others."""
+    return bitmap & ~union(others)
+
+
+def at_least(bitmaps, k):
+    """
+    Days in at least k of the bitmaps (k of N circuits).
+
+    Keeps one bitmap per count 1..k of the days reached so far, so it takes
+    N * k bitwise operations and never loops over days.
+    """
+    if k <= 0:
+        raise ValueError("k must be at least 1")
+    reached = [0] * (k + 1)
+    for bitmap in bitmaps:
+        for count in range(k, 1, -1):
+            reached[count] |= reached[count - 1] & bitmap
+        reached[1] |= bitmap
+    return reached[k]
+
+
+def month_masks(days):
+    """
+    Bitmap of the days of each calendar month in the day index, in order,
+    keyed by month period (pd.Period('2024-04'), so the same month of two
+    years is kept apart).
+    """
+    months = pd.DatetimeIndex(days).to_period('M')
+    return {month: to_bitmap(months == month) for month in pd.unique(months)}
+
+
+def month_label(month, masks):
+    """
+    Label of a month from month_masks: its number ('4') when all the months
+    are in one year, otherwise year and month ('2024-04').
+    """
+    if len({period.year for period in masks}) == 1:
+        return str(month.month)
+    return str(month)
+
+
+def month_counts(bitmap, masks):
+    """Number of days of the bitmap in each month (see month_masks)."""
+    return {month: (bitmap & mask).bit_count() for month, mask in masks.items()}
+
+
+def bitmap_days(bitmap, days):
+    """Days (from the day index) of the set bits of a bitmap."""
+    return pd.DatetimeIndex(days)[bitmap_positions(bitmap)]
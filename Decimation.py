@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+# About one point per pixel across a 15 inch figure at the default 100 dpi
+PLOT_POINTS = 1500
+
+DECIMATION_MODES = ('lttb', 'envelope')
+
+# Local maxima at least this prominent (kW) are always kept
+MAXIMA_PROMINENCE = 100
+
+
+def _time_axis(x):
+    """Seconds from the first point (timestamps), or the values as floats."""
+    x = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        ns = pd.DatetimeIndex(x).asi8
+        return (ns - ns[0]) / 1e9
+    return x.to_numpy(dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: positions of n_out points (the first and
+    last included) that keep the visual shape of the series.
+
+    The points between the first and last are split into n_out - 2 buckets;
+    from each bucket the point forming the largest triangle with the point
+    picked before it and the average of the next bucket is taken. There is one
+    array operation per bucket, so the cost follows the output size.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    sum_x = np.concatenate([[0], np.cumsum(x)])
+    sum_y = np.concatenate([[0], np.cumsum(np.nan_to_num(y))])
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo = hi
+        next_hi = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = (sum_x[next_hi] - sum_x[next_lo]) / (next_hi - next_lo)
+        avg_y = (sum_y[next_hi] - sum_y[next_lo]) / (next_hi - next_lo)
+
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + np.argmax(np.nan_to_num(area, nan=-1))
+        selected[bucket + 1] = a
+
+    return selected
+
+
+def envelope_indices(y, n_out):
+    """
+    Min/max envelope: the lowest and highest point of each of n_out // 2
+    equal-sized buckets, so every excursion keeps its extreme.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+
+    bucket = np.arange(n) * n_buckets // n
+    picked = []
+    for sign in (1, -1):
+        # Within each bucket, sort by value (missing values last) and take the first
+        order = np.lexsort((sign * y, bucket))
+        first = np.ones(n, dtype=bool)
+        first[1:] = bucket[order][1:] != bucket[order][:-1]
+        picked.append(order[first])
+
+    return np.unique(np.concatenate(picked))
+
+
+def preserved_indices(y, levels=None, thresholds=(), prominence=MAXIMA_PROMINENCE):
+    """
+    Positions that decimation must keep: both sides of every level change and
+    of every crossing of a threshold, and the local maxima at least as
+    prominent as prominence.
+    """
+    y = np.asarray(y, dtype=float)
+    keep = []
+
+    changes = []
+    if levels is not None:
+        codes, _ = pd.factorize(pd.Series(levels), use_na_sentinel=False)
+        changes.append(codes[1:] != codes[:-1])
+    for threshold in thresholds:
+        if pd.notna(threshold):
+            above = y >= threshold
+            changes.append(above[1:] != above[:-1])
+    for change in changes:
+        position = np.flatnonzero(change)
+        keep.extend([position, position + 1])
+
+    if len(y) and not np.isnan(y).all():
+        from scipy.signal import find_peaks  # scipy loads only when a series is decimated
+        filled = np.where(np.isnan(y), np.nanmin(y), y)
+        keep.append(find_peaks(filled, prominence=prominence)[0])
+
+    return np.unique(np.concatenate(keep)) if keep else np.empty(0, dtype=int)
+
+
+def decimation_indices(x, y, max_points=PLOT_POINTS, mode='lttb', levels=None, thresholds=(),
+                       prominence=MAXIMA_PROMINENCE, keep=None):
+    """
+    Sorted positions of the points to plot for a series.
+
+    The series is reduced to about max_points points with LTTB or the min/max
+    envelope. Then the points from preserved_indices (and keep) are added
+    back, so threshold crossings and peaks are never decimated away. When
+    there are more of those than max_points, only the highest one of each
+    level per pixel column is kept, so the plot cost stays bounded by the
+    width (at most max_points per level, plus keep).
+
+    Args:
+        x (array-like): Times (or other x values) in order
+        y (array-like): Values (kW)
+        max_points (int): Point budget, roughly the plot width in pixels
+        mode (str): 'lttb' or 'envelope'
+        levels (array-like): DemandLimit of each point, whose changes are kept
+        thresholds (iterable): kW limits whose crossings are kept
+        prominence (float): Local maxima at least this prominent are kept
+        keep (array-like): Further positions to keep
+
+    Returns:
+        np.ndarray: Positions into the series
+    """
+    if mode not in DECIMATION_MODES:
+        raise ValueError(f"Unknown decimation mode '{mode}', expected one of {DECIMATION_MODES}")
+
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+
+    preserved = preserved_indices(y, levels, thresholds, prominence)
+    if len(preserved) > max_points:
+        # More than one per pixel: keep the highest preserved point of each
+        # level in every pixel column, which is all that can be seen
+        codes = np.zeros(n, dtype=int) if levels is None else pd.factorize(pd.Series(levels), use_na_sentinel=False)[0]
+        values = np.nan_to_num(np.asarray(y, dtype=float)[preserved], nan=-np.inf)
+        column = preserved * max_points // n
+        order = np.lexsort((-values, codes[preserved], column))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (column[order][1:] != column[order][:-1]) | (codes[preserved][order][1:] != codes[preserved][order][:-1])
+        preserved = np.sort(preserved[order[first]])
+    if keep is not None:
+        preserved = np.union1d(preserved, np.asarray(keep, dtype=int))
+
+    # Points left for the shape of the series once the preserved ones are in
+    budget = max(max_points - len(preserved), 3)
+    if mode == 'lttb':
+        shape = lttb_indices(_time_axis(x), y, budget)
+    else:
+        shape = envelope_indices(y, budget)
+
+    return np.union1d(shape, preserved)
+
+
+def decimate(df, max_points=PLOT_POINTS, mode='lttb', x='Date', y='Value', level_column='DemandLimit',
+             thresholds=(), prominence=MAXIMA_PROMINENCE):
+    """
+    Rows of a (time ordered) frame to plot; see decimation_indices.
+    """
+    levels = df[level_column] if level_column in df.columns else None
+    positions = decimation_indices(df[x], df[y], max_points, mode, levels, thresholds, prominence)
+    return df.iloc[positions]
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+# Demand limit levels in order of priority (index == level code)
+LEVELS = np.array(['D0', 'D1', 'D2', 'D3'], dtype=object)
+
+# kWTrendCode.py has always reset the held limit on every Circuit B row, so
+# Circuit B is classified without the buffer hysteresis. Keep that by default
+# so the DemandLimit column matches the existing ATest.csv.
+LEGACY_RESET_CIRCUITS = ('B',)
+
+
+def classify_demand_levels(values, d1, d2, d3, buffer, circuit_codes, reset=None):
+    """
+    Assign D0-D3 level codes to every row using the buffer hysteresis rules.
+
+    A row above D1Limit/D2Limit/D3Limit takes that level directly. A row at or
+    below D1Limit keeps the level held by the previous row of the same circuit,
+    dropping a single level when the value falls below the held limit minus the
+    Buffer (D3 -> D2 below D3Limit - Buffer, D2 -> D1 below D2Limit - Buffer,
+    D1 -> D0 below D1Limit - Buffer). The first row of a circuit starts at D0.
+
+    The rows between two directly assigned rows can only drop up to three times,
+    so the whole frame is resolved with at most three array passes instead of a
+    Python loop over the rows.
+
+    Args:
+        values (array-like): kW values
+        d1, d2, d3 (array-like): D1Limit, D2Limit and D3Limit for every row
+        buffer (array-like): Buffer for every row
+        circuit_codes (array-like): Integer circuit code for every row, rows of
+            one circuit must be contiguous and in time order
+        reset (array-like of bool, optional): Rows where the held level is
+            cleared before the row is classified
+
+    Returns:
+        np.ndarray: int8 level codes (0 == D0 ... 3 == D3)
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.int8)
+
+    limits = np.vstack([np.asarray(d1, dtype=float),
+                        np.asarray(d2, dtype=float),
+                        np.asarray(d3, dtype=float)])
+    buffer = np.asarray(buffer, dtype=float)
+    circuit_codes = np.asarray(circuit_codes)
+
+    # Level taken directly from the value (highest limit checked first)
+    direct = np.select([values > limits[2], values > limits[1], values > limits[0]],
+                       [3, 2, 1], default=0).astype(np.int8)
+
+    # Rows that start a new segment: directly assigned rows, the first row of
+    # each circuit and rows where the held level is reset
+    circuit_start = np.ones(n, dtype=bool)
+    circuit_start[1:] = circuit_codes[1:] != circuit_codes[:-1]
+    anchor = (direct > 0) | circuit_start
+    if reset is not None:
+        anchor |= np.asarray(reset, dtype=bool)
+
+    anchor_pos = np.flatnonzero(anchor)
+    segment_end = np.append(anchor_pos[1:], n)
+
+    # next_drop[s, i] is the first row j >= i where a held level s would drop
+    idx = np.arange(n)
+    next_drop = np.full((4, n + 1), n, dtype=np.int64)
+    for s in range(1, 4):
+        drop_here = values < (limits[s - 1] - buffer)
+        next_drop[s, :n] = np.minimum.accumulate(np.where(drop_here, idx, n)[::-1])[::-1]
+
+    # Walk every segment down at most three levels at once
+    held = direct[anchor_pos].astype(np.int64)
+    pos = anchor_pos + 1
+    drops = np.zeros(n + 1, dtype=np.int64)
+    for _ in range(3):
+        active = (held >= 1) & (pos < segment_end)
+        if not active.any():
+            break
+        j = next_drop[held[active], pos[active]]
+        hit = j < segment_end[active]
+        which = np.flatnonzero(active)[hit]
+        drops[j[hit]] += 1
+        held[which] -= 1
+        pos[which] = j[hit] + 1
+        pos[np.flatnonzero(active)[~hit]] = n
+
+    # Level of each row = level of its segment's anchor minus drops since then
+    segment = np.cumsum(anchor) - 1
+    dropped = np.cumsum(drops[:n])
+    levels = direct[anchor_pos][segment] - (dropped - dropped[anchor_pos][segment])
+    return levels.astype(np.int8)
+
+
+def assign_demand_limits(df, reset_circuits=LEGACY_RESET_CIRCUITS):
+    """
+    Build the DemandLimit column ('D0'-'D3') for a frame with Circuit, Value,
+    D1Limit, D2Limit, D3Limit and Buffer columns.
+
+    Each circuit is classified independently in its existing row order.
+
+    Args:
+        df (pd.DataFrame): Frame to classify
+        reset_circuits (iterable): Circuits classified without buffer hysteresis
+
+    Returns:
+        pd.Series: DemandLimit labels aligned with df.index
+    """
+    # Group rows per circuit while keeping the time order inside each circuit
+    circuit_codes, _ = pd.factorize(df['Circuit'])
+    order = np.argsort(circuit_codes, kind='stable')
+
+    reset = df['Circuit'].isin(list(reset_circuits)).to_numpy()
+    codes = np.empty(len(df), dtype=np.int8)
+    codes[order] = classify_demand_levels(
+        df['Value'].to_numpy(dtype=float)[order],
+        df['D1Limit'].to_numpy(dtype=float)[order],
+        df['D2Limit'].to_numpy(dtype=float)[order],
+        df['D3Limit'].to_numpy(dtype=float)[order],
+        df['Buffer'].to_numpy(dtype=float)[order],
+        circuit_codes[order],
+        reset[order],
+    )
+    return pd.Series(LEVELS[codes], index=df.index, name='DemandLimit')
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+CATALOG_COLUMNS = ['Circuit', 'Time', 'Value', 'Prominence', 'LeftBase', 'RightBase', 'Width', 'Row']
+
+
+def peak_catalog(df, prominence=0, width=0, distance=None, time_column='Date',
+                 level_column='DemandLimit'):
+    """
+    Catalog of the demand peaks of every circuit.
+
+    Each circuit's whole series (sorted by time, readings without a value left
+    out) goes through a single scipy.signal.find_peaks call. No per-day loops
+    are needed, and the catalog can be filtered by day, time or level afterwards.
+
+    Args:
+        df (pd.DataFrame): Data with Circuit, Value and time_column columns
+        prominence (float): Minimum prominence of a peak (kW)
+        width (float): Minimum width of a peak (readings, at half prominence)
+        distance (int): Minimum number of readings between neighbouring peaks
+        time_column (str): Column holding each row's timestamp
+        level_column (str): Demand level reported for each peak; left out
+            when the data has no such column
+
+    Returns:
+        pd.DataFrame: One row per peak, in circuit and time order, with
+        Circuit, Time, Value (kW), Prominence, LeftBase / RightBase (times of
+        the bases the prominence is measured from), Width (readings), the
+        level at the peak and Row (index label of the peak row in df)
+    """
+    from scipy.signal import find_peaks  # scipy loads only when peaks are looked for
+
+    ordered = df[df['Value'].notna()].sort_values(['Circuit', time_column], kind='stable')
+    values = ordered['Value'].to_numpy(dtype=float)
+
+    peaks, prominences, left_bases, right_bases, widths = [], [], [], [], []
+    for positions in ordered.groupby('Circuit', sort=False).indices.values():
+        found, properties = find_peaks(values[positions], prominence=prominence,
+                                       width=width, distance=distance)
+        peaks.append(positions[found])
+        prominences.append(properties['prominences'])
+        left_bases.append(positions[properties['left_bases']])
+        right_bases.append(positions[properties['right_bases']])
+        widths.append(properties['widths'])
+
+    columns = CATALOG_COLUMNS[:-1] + ([level_column] if level_column in df.columns else []) + ['Row']
+    if not peaks:
+        return pd.DataFrame(columns=columns)
+
+    peaks = np.concatenate(peaks)
+    times = ordered[time_column].reset_index(drop=True)
+    catalog = pd.DataFrame({
+        'Circuit': ordered['Circuit'].to_numpy()[peaks],
+        'Time': times.take(peaks).to_numpy(),
+        'Value': values[peaks],
+        'Prominence': np.concatenate(prominences),
+        'LeftBase': times.take(np.concatenate(left_bases)).to_numpy(),
+        'RightBase': times.take(np.concatenate(right_bases)).to_numpy(),
+        'Width': np.concatenate(widths),
+        'Row': ordered.index[peaks],
+    })
+    if level_column in df.columns:
+        catalog[level_column] = ordered[level_column].to_numpy()[peaks]
+
+    return catalog[columns]
+
+
+def daily_peaks(catalog):
+    """
+    Highest peak of each circuit on each day (the first one on ties).
+    """
+    day = pd.to_datetime(catalog['Time']).dt.normalize()
+    highest = catalog.groupby([catalog['Circuit'], day], sort=False)['Value'].idxmax()
+    return catalog.loc[np.sort(highest.to_numpy())].reset_index(drop=True)
@@ -0,0 +1,295 @@
+import calendar
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from CodeDependencies import ROOT, code_dependencies
+from Decimation import decimate
+
+# Figures are drawn on their own Agg canvas (no pyplot), so rendering never
+# opens a window or blocks, and works on machines without a display. matplotlib
+# is imported by the drawing functions only, so runs in which every figure is
+# up to date (or that draw nothing) never load it.
+
+# Set colors for different D limits
+LEVEL_COLORS = {
+    'D1': 'blue',   # Color for D1
+    'D2': 'green',  # Color for D2
+    'D3': 'purple', # Color for D3
+    'D0': 'orange'  # Color for D0
+}
+
+# Reference lines drawn for each threshold column
+LIMIT_LINES = [('D1Limit', 'red'), ('D2Limit', 'green'), ('D3Limit', 'purple')]
+
+# Columns the D-level graphs are drawn from
+GRAPH_COLUMNS = ['Circuit', 'Date', 'Value', 'DemandLimit', 'D1Limit', 'D2Limit', 'D3Limit']
+
+# Fingerprints of the figures in an output folder. Changes to the drawing code
+# are picked up from its source (see code_fingerprint); bump the version for
+# anything else that changes the figures, so they are all rendered again
+RENDER_CACHE = '.render_cache.json'
+RENDER_VERSION = 1
+
+# Source digests of the files defining render functions, computed once per run
+_CODE_DIGESTS = {}
+
+
+def month_name(month):
+    """Month number (4) or name ('April') to its name."""
+    return calendar.month_name[month] if isinstance(month, (int, np.integer)) else str(month)
+
+
+def draw_circuit(ax, circuit_data, circuit, month, ylim_margin=500, max_points=None, mode='lttb'):
+    """
+    Scatter one circuit's readings coloured by DemandLimit, with the D1-D3
+    limits as reference lines.
+
+    Each level is a single scatter (selected with a boolean mask) instead of
+    one artist per reading. Levels appear in the legend in the order they are
+    first reached; readings above no limit (or without one) count as D0.
+    With max_points, the readings are decimated first (Decimation.decimate),
+    keeping every level change, limit crossing and peak.
+
+    Args:
+        ax (matplotlib.axes.Axes): Axes to draw on
+        circuit_data (pd.DataFrame): The circuit's rows with Date, Value,
+            DemandLimit and the D1Limit-D3Limit columns
+        circuit (str): Circuit name for the title
+        month: Month for the title
+        ylim_margin (float): Lower Y-limit is the D1 limit minus this margin
+        max_points (int): Point budget (about the plot width in pixels); None
+            plots every reading
+        mode (str): Decimation mode, 'lttb' or 'envelope'
+    """
+    import matplotlib.dates as mdates
+
+    ax.set_title(f'Circuit {circuit}: Value in Month {month}')
+    ax.set_xlabel('Date and Time')
+    ax.set_ylabel('kW')
+
+    # Limits come from the first reading
+    limits = {column: circuit_data[column].iloc[0] if column in circuit_data.columns and not circuit_data.empty
+              else np.nan for column, _ in LIMIT_LINES}
+
+    if max_points is not None:
+        circuit_data = decimate(circuit_data, max_points, mode, thresholds=list(limits.values()))
+
+    # Plot local wall-clock times
+    dates = circuit_data['Date']
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_localize(None)
+    dates = dates.to_numpy()
+    values = circuit_data['Value'].to_numpy()
+
+    levels = circuit_data['DemandLimit'].where(circuit_data['DemandLimit'].isin(['D1', 'D2', 'D3']), 'D0')
+    for level in pd.unique(levels):
+        mask = (levels == level).to_numpy()
+        ax.scatter(dates[mask], values[mask], color=LEVEL_COLORS[level], label=f'{level} Limit')
+
+    # Add reference lines for D1Limit, D2Limit, and D3Limit
+    if not circuit_data.empty:
+        for column, color in LIMIT_LINES:
+            limit = limits[column]
+            if pd.notna(limit):
+                ax.axhline(y=limit, color=color, linestyle='--', label=column)
+
+        # Set the lower Y-limit
+        d1_limit = limits['D1Limit']
+        if pd.notna(d1_limit):
+            ax.set_ylim(bottom=d1_limit - ylim_margin)
+
+    ax.legend()
+    ax.grid(True, which='both', axis='both')  # Enable grid lines for both axes
+
+    # Format x-axis date ticks to show every week (major) and every day (minor)
+    ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=1))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d'))
+    ax.xaxis.set_minor_locator(mdates.DayLocator(interval=1))
+    ax.xaxis.set_minor_formatter(mdates.DateFormatter('%d'))
+    ax.grid(which='both', axis='x', linestyle='--', alpha=0.7)
+
+
+def render_month(monthly_data, month, output_file, circuits=('A', 'B'), ylim_margin=500,
+                 height_per_circuit=5, max_points=None, mode='lttb'):
+    """
+    Render one month with a panel per circuit (stacked) and save it as a PNG.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(15, height_per_circuit * len(circuits)))
+    axes = np.atleast_1d(fig.subplots(nrows=len(circuits), ncols=1))
+    for ax, circuit in zip(axes, circuits):
+        circuit_data = monthly_data[monthly_data['Circuit'] == circuit]
+        draw_circuit(ax, circuit_data, circuit, month, ylim_margin, max_points, mode)
+
+    fig.tight_layout()
+    fig.savefig(output_file)
+    return output_file
+
+
+def code_fingerprint(function):
+    """
+    SHA-256 over the drawing code of a render function: the source of the
+    file defining it, of this module and of the root modules this module
+    imports (Decimation, CodeDependencies). Editing draw_circuit, Decimation or a script's own
+    drawing code renders its figures again; the analysis modules a script
+    imports and the workflow (Pipeline.py) are not part of it.
+    """
+    source_file = inspect.getsourcefile(function)
+    if source_file is None:
+        return f"{function.__module__}.{function.__qualname__}"
+
+    source_file = os.path.abspath(source_file)
+    if source_file not in _CODE_DIGESTS:
+        digest = hashlib.sha256()
+        for path in sorted({source_file} | set(code_dependencies(os.path.abspath(__file__)))):
+            digest.update(f"{os.path.basename(path)};".encode())
+            with open(os.path.join(ROOT, path), 'rb') as handle:
+                digest.update(handle.read())
+        _CODE_DIGESTS[source_file] = digest.hexdigest()
+    return _CODE_DIGESTS[source_file]
+
+
+def figure_fingerprint(function, args, kwargs):
+    """
+    SHA-256 over a figure's render function (name and source, see
+    code_fingerprint), its input data and its settings.
+
+    DataFrames (and Series) are hashed by content, column names and dtypes
+    (timestamps at nanosecond resolution); other arguments by their repr.
+    """
+    digest = hashlib.sha256(f"version={RENDER_VERSION};{function.__module__}.{function.__name__};"
+                            f"{code_fingerprint(function)}".encode())
+    for arg in list(args) + [kwargs[key] for key in sorted(kwargs)]:
+        if isinstance(arg, (pd.DataFrame, pd.Series)):
+            frame = arg.to_frame() if isinstance(arg, pd.Series) else arg
+            # Timestamps hash the same whatever their resolution
+            frame = frame.apply(lambda column: column.dt.as_unit('ns')
+                                if pd.api.types.is_datetime64_any_dtype(column) else column)
+            digest.update(repr(list(zip(frame.columns, map(str, frame.dtypes)))).encode())
+            digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+        else:
+            digest.update(repr(arg).encode())
+    digest.update(repr(sorted(kwargs)).encode())
+    return digest.hexdigest()
+
+
+def _fork_context():
+    """
+    Process context for the render pool, or None when fork is not available.
+
+    Workers are forked so the calling script (which usually has no __main__
+    guard) is not run again in each of them; where fork does not exist
+    (Windows) the figures are rendered in this process.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('fork')
+
+
+def render_figures(jobs, output_dir='.', workers=None, force=False):
+    """
+    Render figures on a process pool, skipping the ones whose inputs have not
+    changed.
+
+    Each figure's fingerprint (figure_fingerprint) is kept in RENDER_CACHE in
+    the output folder. A figure is rendered again only when its fingerprint
+    differs from the recorded one or its PNG is missing.
+
+    Args:
+        jobs (list): (file name, function, args, kwargs) per figure; the
+            figure is drawn by function(*args, output_file=path, **kwargs),
+            which must be a module-level function
+        output_dir (str): Folder the files are written to
+        workers (int): Worker processes (default: one per CPU); 1 renders in
+            this process
+        force (bool): Render every figure even when it is up to date
+
+    Returns:
+        list: Paths of all the figures, rendered or not, in job order
+    """
+    cache_file = os.path.join(output_dir, RENDER_CACHE)
+    cached = {}
+    if os.path.exists(cache_file):
+        with open(cache_file) as handle:
+            cached = json.load(handle)
+
+    paths, pending = [], []
+    for file_name, function, args, kwargs in jobs:
+        path = os.path.join(output_dir, file_name)
+        fingerprint = figure_fingerprint(function, args, kwargs)
+        paths.append(path)
+        if force or cached.get(file_name) != fingerprint or not os.path.exists(path):
+            pending.append((file_name, fingerprint, function, args, dict(kwargs, output_file=path)))
+
+    context = _fork_context()
+    try:
+        if workers == 1 or context is None or len(pending) < 2:
+            for file_name, fingerprint, function, args, kwargs in pending:
+                function(*args, **kwargs)
+                cached[file_name] = fingerprint
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [(file_name, fingerprint, pool.submit(function, *args, **kwargs))
+                           for file_name, fingerprint, function, args, kwargs in pending]
+                for file_name, fingerprint, future in futures:
+                    future.result()
+                    cached[file_name] = fingerprint
+    finally:
+        # Record the figures that were rendered, even when one of them failed
+        with open(cache_file, 'w') as handle:
+            json.dump(cached, handle, indent=2, sort_keys=True)
+
+    print(f"Rendered {len(pending)} of {len(paths)} figures in {output_dir}")
+    return paths
+
+
+def render_monthly_graphs(df, output_dir='.', circuits=('A', 'B'), ylim_margin=500,
+                          file_name='{month}Graph{circuits}.png', workers=None, force=False,
+                          max_points=None, mode='lttb', separate=False):
+    """
+    Render the D-level scatter graph of every month in the data.
+
+    Months are rendered in parallel, and only when their data or settings
+    changed since the graph was last written (see render_figures).
+
+    Args:
+        df (pd.DataFrame): Classified dataset with Month, Circuit, Date, Value,
+            DemandLimit and D1Limit-D3Limit columns
+        output_dir (str): Folder the PNG files are written to
+        circuits (tuple): Circuits drawn on each figure, one panel each
+        ylim_margin (float): Lower Y-limit is the D1 limit minus this margin
+        file_name (str): Name pattern; month is the month name and circuits
+            the circuit names joined with '&' (e.g. 'AprilGraphA&B.png')
+        workers (int): Worker processes (see render_figures)
+        force (bool): Render every month even when it is up to date
+        max_points (int): Point budget per circuit panel (see draw_circuit)
+        mode (str): Decimation mode, 'lttb' or 'envelope'
+        separate (bool): Draw each circuit on a figure of its own (e.g.
+            'AprilGraphA.png' and 'AprilGraphB.png')
+
+    Returns:
+        list: Paths of the graphs, in month order
+    """
+    figures = [(circuit,) for circuit in circuits] if separate else [tuple(circuits)]
+
+    jobs = []
+    for month, monthly_data in df.groupby('Month', sort=False):
+        for figure_circuits in figures:
+            figure_data = monthly_data[monthly_data['Circuit'].isin(figure_circuits)]
+            if figure_data.empty:
+                continue  # Skip if there is no data for the circuits
+
+            name = file_name.format(month=month_name(month), circuits='&'.join(figure_circuits))
+            kwargs = {'circuits': figure_circuits, 'ylim_margin': ylim_margin,
+                      'max_points': max_points, 'mode': mode}
+            jobs.append((name, render_month, (figure_data[GRAPH_COLUMNS], month), kwargs))
+
+    return render_figures(jobs, output_dir, workers, force)
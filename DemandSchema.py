@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from DemandLimits import LEVELS
+from Timestamps import EXCEL_EPOCH, FEED_TIMEZONE
+
+# Compact in-memory/on-disk layout of the classified demand dataset.
+#   Circuit  - categorical circuit ID
+#   Epoch    - int64 milliseconds since 1970-01-01 UTC
+#   Value    - kW, whole numbers (nullable for meter log rows without a value)
+#   Level    - int8 DemandLimit code (0 == D0 ... 3 == D3, -1 == missing)
+#   Buffer, D1Limit, D2Limit, D3Limit - kW thresholds
+#   Notes    - categorical meter notes
+# Date, Excel Time, Timezone and the Year/Month/Day/Hour/Minute columns are
+# derived from Epoch only when they are asked for.
+COMPACT_DTYPES = {
+    'Circuit': 'category',
+    'Epoch': 'int64',
+    'Value': 'Int32',
+    'Level': 'int8',
+    'Buffer': 'Int32',
+    'D1Limit': 'Int32',
+    'D2Limit': 'Int32',
+    'D3Limit': 'Int32',
+    'Notes': 'category',
+}
+
+CALENDAR_FIELDS = ['Year', 'Month', 'Day', 'Hour', 'Minute']
+
+# Column order of the expanded dataset (as written to ATest.csv)
+EXPANDED_COLUMNS = ['Circuit', 'Date', 'Excel Time', 'Value', 'Notes', 'Timezone',
+                    'Year', 'Month', 'Day', 'Hour', 'Minute',
+                    'Buffer', 'D1Limit', 'D2Limit', 'D3Limit', 'DemandLimit']
+
+
+def level_codes(demand_limit):
+    """DemandLimit labels ('D0'-'D3') to int8 codes (-1 when missing)."""
+    return pd.Categorical(demand_limit, categories=LEVELS).codes.astype(np.int8)
+
+
+def level_labels(codes):
+    """int8 level codes back to DemandLimit labels (NaN when missing)."""
+    codes = np.asarray(codes)
+    return np.where(codes >= 0, LEVELS[np.maximum(codes, 0)], np.nan)
+
+
+def local_time(compact, tz=FEED_TIMEZONE):
+    """tz-aware local timestamps of a compact frame."""
+    utc = pd.to_datetime(compact['Epoch'].to_numpy(), unit='ms', utc=True)
+    return pd.Series(utc.tz_convert(tz), index=compact.index, name='Date')
+
+
+def calendar_fields(compact, fields=CALENDAR_FIELDS, tz=FEED_TIMEZONE):
+    """
+    Derive local calendar columns (Year, Month, Day, Hour, Minute) on demand.
+    """
+    date = local_time(compact, tz)
+    return pd.DataFrame({field: getattr(date.dt, field.lower()) for field in fields},
+                        index=compact.index)
+
+
+def to_compact(df):
+    """
+    Convert a classified dataset (the ATest layout) to the compact schema.
+
+    Args:
+        df (pd.DataFrame): Dataset with tz-aware Date, Circuit, Value, Notes,
+            Buffer, D1Limit, D2Limit, D3Limit and DemandLimit columns
+
+    Returns:
+        pd.DataFrame: Compact frame with the COMPACT_DTYPES columns
+    """
+    epoch = df['Date'].dt.tz_convert('UTC').dt.tz_localize(None).astype('datetime64[ms]')
+
+    compact = pd.DataFrame({
+        'Circuit': df['Circuit'].astype('category'),
+        'Epoch': epoch.astype('int64'),
+        'Value': df['Value'].round(),
+        'Level': level_codes(df['DemandLimit']),
+        'Buffer': df['Buffer'].round(),
+        'D1Limit': df['D1Limit'].round(),
+        'D2Limit': df['D2Limit'].round(),
+        'D3Limit': df['D3Limit'].round(),
+        'Notes': df['Notes'].astype('category'),
+    }, index=df.index)
+
+    return compact.astype(COMPACT_DTYPES)
+
+
+def from_compact(compact, tz=FEED_TIMEZONE):
+    """
+    Expand a compact frame back to the ATest layout used by the scripts.
+    """
+    date = local_time(compact, tz)
+    wall = date.dt.tz_localize(None)
+    utc_offset = (wall - date.dt.tz_convert('UTC').dt.tz_localize(None)).dt.total_seconds()
+
+    df = pd.DataFrame({
+        'Circuit': compact['Circuit'].astype(str),
+        'Date': date,
+        'Excel Time': (wall - EXCEL_EPOCH).dt.total_seconds() / 86_400,
+        'Value': compact['Value'].astype('float64'),
+        'Notes': compact['Notes'].astype(object).where(compact['Notes'].notna(), np.nan),
+        'Timezone': np.where(utc_offset == -5 * 3600, 'EST', 'EDT'),
+    }, index=compact.index)
+
+    df = df.join(calendar_fields(compact, tz=tz))
+
+    for column in ['Buffer', 'D1Limit', 'D2Limit', 'D3Limit']:
+        df[column] = compact[column].astype('float64')
+    df['DemandLimit'] = level_labels(compact['Level'])
+
+    return df[EXPANDED_COLUMNS]
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+LIMIT_LEVELS = ['D1', 'D2', 'D3']
+
+
+def monthly_statistics(daily):
+    """
+    Aggregate the per-day limit counts into per-(month, circuit) statistics
+    with a single grouped reduction.
+
+    Args:
+        daily (pd.DataFrame): One row per (DateOnly, Circuit), in the order the
+            days were seen, with d1_count, d2_count, d3_count and
+            d1_total_duration, d2_total_duration, d3_total_duration columns
+
+    Returns:
+        pd.DataFrame: Indexed by (Month 'YYYY-MM', Circuit) in order of first
+        appearance, with days_with_limits, limit_days (comma separated dates),
+        first_hit (row of the first day with a limit hit), transitions and, for
+        each of D1-D3, the total time, count and average time
+    """
+    days = daily.reset_index()
+
+    # Format each distinct day once
+    codes, unique_days = pd.factorize(days['DateOnly'])
+    unique_days = pd.to_datetime(pd.Index(unique_days))
+    days['Month'] = unique_days.strftime('%Y-%m')[codes]
+    days['DayLabel'] = unique_days.strftime('%Y-%m-%d')[codes]
+
+    # A day counts when any limit above D0 was hit
+    days['transitions'] = days[[f'{level.lower()}_count' for level in LIMIT_LEVELS]].sum(axis=1)
+    days['limit_hit'] = days['transitions'] > 0
+    days['hit_row'] = np.where(days['limit_hit'], np.arange(len(days)), np.nan)
+
+    aggregations = {
+        'days_with_limits': ('limit_hit', 'sum'),
+        'first_hit': ('hit_row', 'min'),
+        'transitions': ('transitions', 'sum'),
+    }
+    for level in LIMIT_LEVELS:
+        prefix = level.lower()
+        aggregations[f'{prefix}_total_time'] = (f'{prefix}_total_duration', 'sum')
+        aggregations[f'{prefix}_count'] = (f'{prefix}_count', 'sum')
+
+    stats = days.groupby(['Month', 'Circuit'], sort=False).agg(**aggregations)
+
+    hits = days[days['limit_hit']]
+    stats['limit_days'] = hits.groupby(['Month', 'Circuit'], sort=False)['DayLabel'].agg(', '.join)
+
+    for level in LIMIT_LEVELS:
+        prefix = level.lower()
+        count = stats[f'{prefix}_count']
+        stats[f'{prefix}_average_time'] = (stats[f'{prefix}_total_time'] / count.where(count > 0)).fillna(0)
+
+    return stats
+
+
+def write_cumulative_statistics(stats, file_path='cumulative_demand_statistics.txt'):
+    """
+    Write the monthly statistics as the cumulative demand statistics report.
+    """
+    by_month = stats.groupby(level='Month', sort=False)
+
+    # Circuits and months are listed in the order their first limit hit was seen
+    hit_stats = stats[stats['days_with_limits'] > 0]
+    circuit_days = (hit_stats.groupby(level='Circuit', sort=False)
+                    .agg(days=('days_with_limits', 'sum'), first_hit=('first_hit', 'min'))
+                    .sort_values('first_hit', kind='stable'))
+    month_first_hit = hit_stats.groupby(level='Month')['first_hit'].transform('min')
+    hit_stats = hit_stats.assign(month_first_hit=month_first_hit).sort_values(
+        ['month_first_hit', 'first_hit'], kind='stable')
+
+    with open(file_path, 'w') as file:
+        file.write("--- Cumulative Demand Statistics ---\n")
+
+        # Report the number of days that a demand limit was hit, and for which circuit
+        file.write("Number of Days Demand Limit was Hit:\n")
+        for circuit, days in circuit_days['days'].items():
+            file.write(f"  Circuit {circuit}: {days} days\n")
+
+        # Report all days in each month that a demand limit was hit and for which circuit
+        file.write("\nDays in Each Month that Demand Limit was Hit:\n")
+        for month, circuits in hit_stats.groupby(level='Month', sort=False):
+            file.write(f"  Month: {month}\n")
+            for (_, circuit), days in circuits['limit_days'].items():
+                file.write(f"    Circuit {circuit}: {days}\n")
+
+        # Report the sum number of transition occurrences in each month, and for which circuit
+        file.write("\nSum Number of Transition Occurrences in Each Month:\n")
+        for month, circuits in by_month:
+            file.write(f"  Month: {month}\n")
+            for (_, circuit), transitions in circuits['transitions'].items():
+                file.write(f"    Circuit {circuit}: {transitions} transitions\n")
+
+        # Report total time at D1 and D2 for each month and for each circuit
+        for level in ['D1', 'D2']:
+            file.write(f"\nTotal Time at {level} for Each Month:\n")
+            for month, circuits in by_month:
+                file.write(f"  Month: {month}\n")
+                for (_, circuit), total_time in circuits[f'{level.lower()}_total_time'].items():
+                    file.write(f"    Circuit {circuit}: {total_time} minutes\n")
+
+        # Report average time at D1, D2 and D3 for each month
+        for level in LIMIT_LEVELS:
+            file.write(f"\nAverage Time at {level} for Each Month:\n")
+            for month, circuits in by_month:
+                file.write(f"  Month: {month}\n")
+                for (_, circuit), avg_time in circuits[f'{level.lower()}_average_time'].items():
+                    file.write(f"    Circuit {circuit}: {avg_time:.2f} minutes\n")
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+
+def episode_table(df, column='DemandLimit', by=('Circuit',), time_column='Date'):
+    """
+    Run-length encode a column into episodes: one row per run of consecutive
+    equal values within each group.
+
+    Rows keep their existing order inside each group (sort the frame by time
+    first); groups may be interleaved. The whole frame is encoded with a single
+    array pass.
+
+    Args:
+        df (pd.DataFrame): Data to encode
+        column (str): Column whose runs are wanted (e.g. 'DemandLimit')
+        by (iterable): Columns that split the data into independent groups
+        time_column (str): Column holding each row's timestamp
+
+    Returns:
+        pd.DataFrame: One row per episode with the by columns, the run value
+        (named after column), Start (time of the first row), End (time of the
+        first row of the next episode in the group, or of the episode's last
+        row when it is the last one), Samples, Duration (End - Start), Closed
+        (whether another episode follows in the same group) and FirstRow /
+        LastRow (index labels of the episode's first and last rows)
+    """
+    by = list(by)
+    columns = by + [column, 'Start', 'End', 'Samples', 'Duration', 'Closed', 'FirstRow', 'LastRow']
+    if len(df) == 0:
+        return pd.DataFrame(columns=columns)
+
+    # Bring each group together while keeping the row order inside it
+    group_codes = df.groupby(by, sort=False, dropna=False).ngroup().to_numpy()
+    order = np.argsort(group_codes, kind='stable')
+    groups = group_codes[order]
+    values = df[column].to_numpy()[order]
+    value_codes, _ = pd.factorize(values, use_na_sentinel=False)
+
+    # A new episode starts where the group or the value changes
+    n = len(order)
+    new_episode = np.ones(n, dtype=bool)
+    new_episode[1:] = (groups[1:] != groups[:-1]) | (value_codes[1:] != value_codes[:-1])
+    first = np.flatnonzero(new_episode)
+    last = np.append(first[1:], n) - 1
+
+    closed = np.zeros(len(first), dtype=bool)
+    closed[:-1] = groups[first[1:]] == groups[first[:-1]]
+    end_pos = np.where(closed, last + 1, last)
+
+    times = df[time_column].iloc[order].reset_index(drop=True)
+    table = df[by].iloc[order[first]].reset_index(drop=True)
+    table[column] = values[first]
+    table['Start'] = times.iloc[first].reset_index(drop=True)
+    table['End'] = times.iloc[end_pos].reset_index(drop=True)
+    table['Samples'] = last - first + 1
+    table['Duration'] = table['End'] - table['Start']
+    table['Closed'] = closed
+    table['FirstRow'] = df.index[order[first]]
+    table['LastRow'] = df.index[order[last]]
+    return table[columns]
+
+
+def above_d0_periods(df, by=('DateOnly', 'Circuit'), time_column='Date'):
+    """
+    Periods where the demand stayed above D0, per group (by default per day and
+    circuit).
+
+    A period ends at the first D0 reading after it, or at its own last reading
+    when no D0 reading follows in the group.
+
+    Args:
+        df (pd.DataFrame): Data with a DemandLimit column, sorted by time
+        by (iterable): Columns that split the data into independent groups
+        time_column (str): Column holding each row's timestamp
+
+    Returns:
+        pd.DataFrame: The episode_table rows of the periods above D0
+    """
+    above = df.assign(AboveD0=df['DemandLimit'] != 'D0')
+    episodes = episode_table(above, column='AboveD0', by=by, time_column=time_column)
+    return episodes[episodes['AboveD0'].astype(bool)].reset_index(drop=True)
@@ -0,0 +1,110 @@
+import io
+import re
+import zipfile
+
+import pandas as pd
+
+from Timestamps import parse_feed_timestamps
+
+# Raw feed exports as they are downloaded from the metering system
+FEED_ARCHIVES = ['A Feed Jan - Sept 2024.zip', 'B Feed Jan - Sept 2024.zip']
+
+# Rows parsed per batch when streaming a feed
+CHUNK_SIZE = 50_000
+
+# The first line of each export names the meter, e.g.
+# "... / Electric Meter - Boneyard - A Feed / kW Trend"
+FEED_TITLE = re.compile(r'-\s*(\w+)\s+Feed\b')
+
+
+def clean_feed_frame(df):
+    """
+    Parse the EST/EDT-suffixed Date column and add the Timezone, Year, Month,
+    Day, Hour and Minute columns used by kWTrendCode.py.
+    """
+    df = df.copy()
+
+    # Take the wall clock from the Excel Time serial column (the Date string
+    # where it is missing); the EST/EDT suffix resolves the repeated hour when
+    # the clocks fall back
+    df['Date'], df['Timezone'] = parse_feed_timestamps(df['Date'], excel_time=df['Excel Time'])
+
+    # Extracting year, month, day, hour, and minute into new columns
+    df['Year'] = df['Date'].dt.year
+    df['Month'] = df['Date'].dt.month
+    df['Day'] = df['Date'].dt.day
+    df['Hour'] = df['Date'].dt.hour
+    df['Minute'] = df['Date'].dt.minute
+
+    return df
+
+
+def iter_feed_chunks(zip_path, chunksize=CHUNK_SIZE):
+    """
+    Stream every CSV export inside a feed archive in bounded-size batches.
+
+    The archive is decompressed on the fly, so only one batch of rows is held
+    in memory at a time.
+
+    Args:
+        zip_path (str): Path to a feed archive such as 'A Feed Jan - Sept 2024.zip'
+        chunksize (int): Number of rows per batch
+
+    Yields:
+        pd.DataFrame: Cleaned batch with Circuit, Date, Excel Time, Value,
+        Notes, Timezone, Year, Month, Day, Hour and Minute columns
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.namelist():
+            if not member.lower().endswith('.csv'):
+                continue
+
+            with archive.open(member) as raw:
+                handle = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+
+                # The circuit is only named in the title line of the export
+                title = handle.readline()
+                match = FEED_TITLE.search(title)
+                if match is None:
+                    raise ValueError(f"Cannot find the feed name in {zip_path}/{member}: {title.strip()}")
+                circuit = match.group(1)
+
+                for chunk in pd.read_csv(handle, chunksize=chunksize,
+                                         dtype={'Date': str, 'Notes': str}):
+                    chunk.insert(0, 'Circuit', circuit)
+                    chunk = chunk.dropna(subset=['Date'])
+                    yield clean_feed_frame(chunk)
+
+
+def read_feed_archives(zip_paths=FEED_ARCHIVES, chunksize=CHUNK_SIZE):
+    """
+    Load and clean all feed archives into a single DataFrame (circuit by circuit).
+    """
+    chunks = [chunk for zip_path in zip_paths for chunk in iter_feed_chunks(zip_path, chunksize)]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def ingest_feeds(zip_paths=FEED_ARCHIVES, output_file='kWTrendClean.csv', chunksize=CHUNK_SIZE):
+    """
+    Write the cleaned feeds to a single CSV without ever holding a whole feed
+    in memory.
+
+    Args:
+        zip_paths (list): Feed archives to read, in circuit order
+        output_file (str): Path of the normalized CSV
+        chunksize (int): Number of rows per batch
+
+    Returns:
+        int: Number of rows written
+    """
+    rows = 0
+    for zip_path in zip_paths:
+        for chunk in iter_feed_chunks(zip_path, chunksize):
+            chunk.to_csv(output_file, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+
+if __name__ == "__main__":
+    total_rows = ingest_feeds()
+    print(f"Saved {total_rows} rows to 'kWTrendClean.csv'")
@@ -0,0 +1,184 @@
+import calendar
+import os
+import re
+
+import pandas as pd
+
+from WorkbookCache import read_workbook
+
+# Layout of the store: one Parquet file per circuit and calendar month,
+#   <root>/circuit=A/year=2024/month=6/part.parquet
+# Rows keep the order they were written in (by date within each partition).
+PARTITION_KEYS = ['circuit', 'year', 'month']
+PART_FILE = 'part.parquet'
+
+_PARTITION_DIR = re.compile(r'^(circuit|year|month)=(.+)$')
+
+
+def partition_path(root, circuit, year, month):
+    """Folder of one partition."""
+    return os.path.join(root, f'circuit={circuit}', f'year={year}', f'month={month}')
+
+
+def write_partitions(df, root, time_column='Date'):
+    """
+    Write classified data to the store, one file per (circuit, year, month).
+
+    Partitions present in df are replaced; the others are left as they are,
+    so appending a month (or rewriting one) only touches that month.
+
+    Args:
+        df (pd.DataFrame): Data with Circuit and time_column columns (e.g. the
+            month sheets of ATestByMonth.xlsx, or the classified dataset)
+        root (str): Folder of the store
+        time_column (str): Column whose calendar year and month pick the
+            partition (local time for tz-aware timestamps)
+
+    Returns:
+        list: Paths of the written files
+    """
+    dates = pd.to_datetime(df[time_column])
+    keys = [df['Circuit'], dates.dt.year.rename('year'), dates.dt.month.rename('month')]
+
+    paths = []
+    for (circuit, year, month), partition in df.groupby(keys, sort=True):
+        directory = partition_path(root, circuit, year, month)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, PART_FILE)
+        partition.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def list_partitions(root):
+    """
+    Partitions in the store.
+
+    Returns:
+        pd.DataFrame: circuit, year, month and path of every partition, sorted
+        by circuit, year and month
+    """
+    rows = []
+    for directory, _, files in os.walk(root):
+        if PART_FILE not in files:
+            continue
+        parts = os.path.relpath(directory, root).split(os.sep)
+        matches = [_PARTITION_DIR.match(part) for part in parts]
+        if len(parts) != len(PARTITION_KEYS) or not all(matches):
+            continue
+        keys = dict(match.groups() for match in matches)
+        rows.append({'circuit': keys['circuit'], 'year': int(keys['year']), 'month': int(keys['month']),
+                     'path': os.path.join(directory, PART_FILE)})
+
+    partitions = pd.DataFrame(rows, columns=PARTITION_KEYS + ['path'])
+    return partitions.sort_values(PARTITION_KEYS, kind='stable').reset_index(drop=True)
+
+
+def _bound(value, dates):
+    """A date bound comparable with the (possibly tz-aware) dates."""
+    bound = pd.Timestamp(value)
+    tz = getattr(dates.dt, 'tz', None)
+    if tz is not None and bound.tz is None:
+        bound = bound.tz_localize(tz)
+    return bound
+
+
+def read_partitions(root, circuits=None, start=None, end=None, months=None, years=None,
+                    columns=None, time_column='Date'):
+    """
+    Read classified data from the store, opening only the partitions that
+    can hold matching rows.
+
+    Args:
+        root (str): Folder of the store
+        circuits (list): Circuits to read (default: all)
+        start, end: Date range, start inclusive and end exclusive; the
+            partitions outside it are not read, and the rows outside it are
+            dropped from the ones that are
+        months (list): Calendar months (1-12) to read (default: all)
+        years (list): Years to read (default: all)
+        columns (list): Columns to read (default: all)
+        time_column (str): Column the date range applies to
+
+    Returns:
+        pd.DataFrame: Rows of the matching partitions, by circuit, year and
+        month
+    """
+    partitions = list_partitions(root)
+    if circuits is not None:
+        partitions = partitions[partitions['circuit'].isin([str(circuit) for circuit in circuits])]
+    if months is not None:
+        partitions = partitions[partitions['month'].isin(months)]
+    if years is not None:
+        partitions = partitions[partitions['year'].isin(years)]
+
+    # Keep the partitions whose month overlaps [start, end) (in local time)
+    month_start = pd.to_datetime(pd.DataFrame({'year': partitions['year'], 'month': partitions['month'], 'day': 1}))
+    overlaps = pd.Series(True, index=partitions.index)
+    if start is not None:
+        overlaps &= month_start + pd.offsets.MonthBegin(1) > pd.Timestamp(start).tz_localize(None)
+    if end is not None:
+        overlaps &= month_start < pd.Timestamp(end).tz_localize(None)
+    partitions = partitions[overlaps]
+
+    if columns is not None and time_column not in columns and (start is not None or end is not None):
+        read_columns = list(columns) + [time_column]
+    else:
+        read_columns = columns
+
+    frames = [pd.read_parquet(path, columns=read_columns) for path in partitions['path']]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+
+    if start is not None:
+        df = df[df[time_column] >= _bound(start, df[time_column])]
+    if end is not None:
+        df = df[df[time_column] < _bound(end, df[time_column])]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
+
+
+def partition_workbook(workbook, root):
+    """
+    Convert a month-sheet workbook (e.g. ATestByMonth.xlsx) into the store.
+    """
+    sheets = read_workbook(workbook)
+    return write_partitions(pd.concat(sheets.values(), ignore_index=True), root)
+
+
+def read_month_sheets(source, sheet_names=None, circuits=None):
+    """
+    Month sheets ('April', 'May', ...) from a month-sheet workbook or from a
+    partitioned store.
+
+    For a store (a folder), each sheet is built from the partitions of that
+    calendar month only, with circuits in order, so rerunning one month reads
+    only that month's files.
+
+    Args:
+        source (str): Workbook path or store folder
+        sheet_names (list): Month sheets to return (default: all)
+        circuits (list): Circuits to read from a store (default: all)
+
+    Returns:
+        dict: Sheet name -> DataFrame, in the order of sheet_names
+    """
+    if not os.path.isdir(source):
+        return read_workbook(source, sheet_names)
+
+    if sheet_names is None:
+        months = sorted(set(list_partitions(source)['month']))
+        sheet_names = [calendar.month_name[month] for month in months]
+
+    month_numbers = {calendar.month_name[number]: number for number in range(1, 13)}
+    sheets = {}
+    for name in sheet_names:
+        if name not in month_numbers:
+            raise ValueError(f"Worksheet named '{name}' is not a month")
+        sheet = read_partitions(source, circuits=circuits, months=[month_numbers[name]])
+        if sheet.empty:
+            raise ValueError(f"Worksheet named '{name}' not found in {source}")
+        sheets[name] = sheet
+    return sheets
@@ -0,0 +1,305 @@
+import argparse
+import hashlib
+import json
+import os
+import runpy
+import sys
+import time
+import traceback
+
+from CodeDependencies import code_dependencies
+
+# Only the standard library is imported here: pandas, matplotlib and scipy are
+# loaded by the stages that run, so checking an up-to-date workflow is instant
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Fingerprints of the stages and of the files they read and wrote, and a
+# version to bump when the way stages are fingerprinted changes
+PIPELINE_CACHE = '.pipeline_cache.json'
+PIPELINE_VERSION = 1
+
+# One sheet per month with the SyncedDemandLimit and ValueROC columns; it is
+# prepared outside these scripts, so it is a source of the workflow
+MONTH_WORKBOOK = '1119SustainedPeriods/ATestByMonth.xlsx'
+
+# Months with a graph (the dataset) and with decline plots (the month workbook)
+GRAPH_MONTHS = ['April', 'May', 'June', 'July', 'August', 'September', 'October']
+DECLINE_MONTHS = GRAPH_MONTHS[:-1]
+
+# Stages of the workflow. Paths are relative to the repository root, and each
+# stage runs in the folder of its script, as when the script is run by hand.
+#   script  - script the stage runs (as __main__)
+#   call    - (function, args, kwargs) of the script to call instead, with
+#             paths relative to the script's folder
+#   inputs  - files the stage reads; it runs after the stages writing them
+#   outputs - files the stage writes (each run must rewrite them)
+#   figures - PNGs the stage renders; DemandPlots.render_figures leaves the
+#             unchanged ones as they are, so they only have to exist
+# A stage is fingerprinted by its script, the root modules the script imports,
+# its call and the contents of its inputs (see stage_fingerprint).
+STAGES = [
+    # The dataset's own cache key covers only the source files; the stage also
+    # runs when the code building it changed, so it always rebuilds
+    {'name': 'dataset', 'script': 'DatasetCache.py', 'call': ('load_demand_dataset', (), {'rebuild': True}),
+     'inputs': ['A Feed Jan - Sept 2024.zip', 'B Feed Jan - Sept 2024.zip', '2024 Thresholds.xlsx'],
+     'outputs': ['ATest.parquet']},
+    {'name': 'trend_report', 'script': 'kWTrendCode.py',
+     'inputs': ['ATest.parquet'],
+     'outputs': ['ATest.csv', 'DemandLimitReportWithDuration.txt', 'exceeded_d0_report.txt']},
+    {'name': 'demand_statistics', 'script': 'ATestCode2.py',
+     'inputs': ['ATest.parquet'],
+     'outputs': ['daily_demand_report.txt', 'cumulative_demand_statistics.txt']},
+    {'name': 'transition_limits', 'script': 'ATestCode.py',
+     'inputs': ['ATest.parquet'],
+     'outputs': ['transition_limits_report.txt']},
+    {'name': 'cumulative_report', 'script': '102924Plots/ATestCumulativeReport.py',
+     'inputs': ['ATest.parquet'],
+     'outputs': ['102924Plots/ATestCumulativeReport.xlsx']},
+    {'name': 'final_report', 'script': '102924Plots/AFinalTestCode.py',
+     'inputs': ['ATest.parquet'],
+     'outputs': ['102924Plots/DemandLimitReportWithDuration.txt', '102924Plots/exceeded_d0_report.txt'],
+     'figures': [f'102924Plots/{month}GraphA&B.png' for month in GRAPH_MONTHS]},
+    {'name': 'circuit_graphs', 'script': '1119SustainedPeriods/Plots.py',
+     'inputs': ['ATest.parquet'],
+     'outputs': [],
+     'figures': [f'1119SustainedPeriods/{month}Graph{circuit}.png'
+                 for circuit in ['A', 'B'] for month in GRAPH_MONTHS]},
+    {'name': 'declines', 'script': '1119SustainedPeriods/Peaks.py',
+     'inputs': [MONTH_WORKBOOK],
+     'outputs': ['1119SustainedPeriods/sustained_decline_periods.xlsx'],
+     'figures': [f'1119SustainedPeriods/{month}{circuit}DecliningPeriods.png'
+                 for month in DECLINE_MONTHS for circuit in ['A', 'B']]},
+    {'name': 'rates_of_change', 'script': '1119SustainedPeriods/RatesOfChange.py',
+     'inputs': ['1119SustainedPeriods/sustained_decline_periods.xlsx'],
+     'outputs': ['1119SustainedPeriods/processed_sustained_decline_periods.xlsx']},
+    {'name': 'peak_windows', 'script': '1119SustainedPeriods/Peaks2.py',
+     'inputs': [MONTH_WORKBOOK],
+     'outputs': ['1119SustainedPeriods/ATestByMonth_Processed.xlsx']},
+    {'name': 'transitions', 'script': '12102024/TransitionPoints.py',
+     'call': ('save_transitions', ('../' + MONTH_WORKBOOK, 'DemandTransitions.xlsx'),
+              {'sweep_file': 'TransitionContextSweep.xlsx'}),
+     'inputs': [MONTH_WORKBOOK],
+     'outputs': ['12102024/DemandTransitions.xlsx', '12102024/TransitionContextSweep.xlsx']},
+    {'name': 'transition_rates', 'script': '12102024/TransitionContextPoints.py',
+     'inputs': ['12102024/DemandTransitions.xlsx'],
+     'outputs': ['12102024/TransitionRates.xlsx']},
+]
+
+
+def _path(path):
+    return os.path.join(ROOT, path)
+
+
+def _mtime(path):
+    return os.stat(_path(path)).st_mtime_ns if os.path.exists(_path(path)) else None
+
+
+def file_hash(path, files, block_size=1 << 20):
+    """
+    SHA-256 of a file's contents.
+
+    Hashes are remembered in files (relative path -> size, mtime and hash), so
+    a file is read again only when its size or modification time changed.
+    """
+    stat = os.stat(_path(path))
+    known = files.get(path)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha256']
+
+    digest = hashlib.sha256()
+    with open(_path(path), 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''):
+            digest.update(block)
+    files[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return files[path]['sha256']
+
+
+def stage_fingerprint(stage, files):
+    """
+    SHA-256 over a stage's code (script and the root modules it imports), its
+    call and the contents of its inputs.
+    """
+    digest = hashlib.sha256(f"version={PIPELINE_VERSION};{stage['name']};{stage.get('call')!r}".encode())
+    for path in code_dependencies(stage['script']) + list(stage['inputs']):
+        digest.update(f"{path}={file_hash(path, files)};".encode())
+    return digest.hexdigest()
+
+
+def stage_graph(stages=STAGES):
+    """Stage name -> names of the stages writing its inputs."""
+    writers = {}
+    for stage in stages:
+        for output in stage['outputs']:
+            if output in writers:
+                raise ValueError(f"'{output}' is written by both '{writers[output]}' and '{stage['name']}'")
+            writers[output] = stage['name']
+    return {stage['name']: [writers[path] for path in stage['inputs'] if path in writers] for stage in stages}
+
+
+def stage_order(targets=None, stages=STAGES):
+    """
+    Names of the stages to bring up to date, each after the stages it reads
+    from, in declaration order otherwise.
+
+    Args:
+        targets (list): Stage names (default: all); the stages they read from
+            are included
+        stages (list): Stage declarations
+    """
+    graph = stage_graph(stages)
+    for name in targets or []:
+        if name not in graph:
+            raise ValueError(f"Unknown stage '{name}', expected one of {list(graph)}")
+
+    order, state = [], {}
+
+    def visit(name):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Stage '{name}' reads its own outputs through other stages")
+        state[name] = 'visiting'
+        for upstream in graph[name]:
+            visit(upstream)
+        state[name] = 'done'
+        order.append(name)
+
+    for name in targets or list(graph):
+        visit(name)
+    return order
+
+
+def run_stage(stage):
+    """Run a stage's script (or call its function) in the script's folder."""
+    script = _path(stage['script'])
+    previous = os.getcwd()
+    os.chdir(os.path.dirname(script))
+    try:
+        if 'call' in stage:
+            function, args, kwargs = stage['call']
+            namespace = runpy.run_path(script, run_name='pipeline')
+            namespace[function](*args, **kwargs)
+        else:
+            runpy.run_path(script, run_name='__main__')
+    finally:
+        os.chdir(previous)
+
+
+def run_pipeline(targets=None, force=False, dry_run=False, stages=STAGES):
+    """
+    Run the stages whose code, call or inputs changed since they last ran, or
+    whose outputs or figures are missing or were changed by hand.
+
+    Stages run in this process, in dependency order, so the shared modules and
+    parsed workbooks are loaded once. Inputs are compared by content, so a
+    stage that rewrites an identical output does not make the stages reading
+    it run again. When a stage fails, the stages reading its outputs are
+    skipped and the others still run.
+
+    Args:
+        targets (list): Stage names to bring up to date (default: all)
+        force (bool): Run the stages even when they are up to date
+        dry_run (bool): Only report which stages would run
+        stages (list): Stage declarations
+
+    Returns:
+        dict: Stage name -> 'up to date', 'ran', 'would run', 'failed' or
+        'skipped'
+    """
+    cache_file = _path(PIPELINE_CACHE)
+    cache = {'files': {}, 'stages': {}}
+    if os.path.exists(cache_file):
+        with open(cache_file) as handle:
+            cache = json.load(handle)
+    files = cache['files']
+
+    graph = stage_graph(stages)
+    declared = {stage['name']: stage for stage in stages}
+    status = {}
+    if sys.path[0] != ROOT:
+        sys.path.insert(0, ROOT)  # Root scripts import the shared modules by name
+
+    try:
+        for name in stage_order(targets, stages):
+            stage = declared[name]
+            upstream = [status.get(writer) for writer in graph[name]]
+            if 'failed' in upstream or 'skipped' in upstream:
+                print(f"Skipping {name}: a stage it reads from failed")
+                status[name] = 'skipped'
+                continue
+            if dry_run and 'would run' in upstream:
+                print(f"{name} would run ({stage['script']})")
+                status[name] = 'would run'
+                continue
+
+            missing = [path for path in stage['inputs'] if not os.path.exists(_path(path))]
+            if missing:
+                print(f"Error: {name} cannot run, missing input(s): {', '.join(missing)}")
+                status[name] = 'failed'
+                continue
+
+            fingerprint = stage_fingerprint(stage, files)
+            recorded = cache['stages'].get(name, {})
+            changed = {kind: [path for path in stage.get(kind, [])
+                              if not os.path.exists(_path(path))
+                              or recorded.get(kind, {}).get(path) != file_hash(path, files)]
+                       for kind in ['outputs', 'figures']}
+            if not force and recorded.get('fingerprint') == fingerprint and not any(changed.values()):
+                print(f"{name} is up to date")
+                status[name] = 'up to date'
+                continue
+
+            if dry_run:
+                print(f"{name} would run ({stage['script']})")
+                status[name] = 'would run'
+                continue
+
+            print(f"Running {name} ({stage['script']})")
+            start = time.perf_counter()
+
+            # Figures changed since the stage rendered them are removed, so the
+            # render cache draws them again instead of keeping the edited files
+            for path in changed['figures']:
+                if os.path.exists(_path(path)):
+                    os.remove(_path(path))
+
+            written = {path: _mtime(path) for path in stage['outputs']}
+            try:
+                run_stage(stage)
+                # Some scripts report their errors and return; an output left
+                # as it was means the stage did not finish
+                unwritten = [path for path in stage['outputs'] if _mtime(path) in (None, written[path])]
+                unwritten += [path for path in stage.get('figures', []) if _mtime(path) is None]
+                if unwritten:
+                    raise RuntimeError(f"it did not write {', '.join(unwritten)}")
+            except Exception as e:
+                print(f"Error: {name} failed: {str(e)}")
+                traceback.print_exc()
+                cache['stages'].pop(name, None)
+                status[name] = 'failed'
+                continue
+
+            cache['stages'][name] = {'fingerprint': fingerprint}
+            for kind in ['outputs', 'figures']:
+                cache['stages'][name][kind] = {path: file_hash(path, files) for path in stage.get(kind, [])}
+            status[name] = 'ran'
+            print(f"Finished {name} in {time.perf_counter() - start:.1f} s")
+    finally:
+        # Record the stages that ran, even when a later one failed
+        if not dry_run:
+            with open(cache_file, 'w') as handle:
+                json.dump(cache, handle, indent=2, sort_keys=True)
+
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stale stages of the demand analysis workflow.")
+    parser.add_argument('stages', nargs='*', help="stages to bring up to date (default: all)")
+    parser.add_argument('--force', action='store_true', help="run the stages even when they are up to date")
+    parser.add_argument('--dry-run', action='store_true', help="only list the stages that would run")
+    args = parser.parse_args()
+
+    status = run_pipeline(args.stages or None, force=args.force, dry_run=args.dry_run)
+    sys.exit(1 if 'failed' in status.values() or 'skipped' in status.values() else 0)
@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:  # Fall back to pandas' default Excel writer
+    xlsxwriter = None
+
+REPORT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+# Same cell format pandas uses for timestamps
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+def _cell_rows(table):
+    """Rows of a table as tuples of plain values, missing values as None."""
+    values = table.astype(object)
+    values = values.where(table.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+def write_workbook(sheets, output_file):
+    """
+    Write all sheets of a workbook in a single session.
+
+    With xlsxwriter, rows are streamed in constant-memory mode: each row is
+    flushed to disk as soon as it is written, so memory stays flat and the
+    write time grows with the output size only. Without it, the sheets are
+    written through pandas' ExcelWriter in one pass.
+
+    Args:
+        sheets (dict): Sheet name -> DataFrame, in sheet order
+        output_file (str): Path of the .xlsx file
+    """
+    if xlsxwriter is None:
+        with pd.ExcelWriter(output_file) as writer:
+            for sheet_name, table in sheets.items():
+                table.to_excel(writer, sheet_name=sheet_name, index=False)
+        return output_file
+
+    workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True,
+                                                 'default_date_format': DATETIME_FORMAT})
+    header = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+    try:
+        for sheet_name, table in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [str(column) for column in table.columns], header)
+            for row, values in enumerate(_cell_rows(table), start=1):
+                worksheet.write_row(row, 0, values)
+    finally:
+        workbook.close()
+    return output_file
+
+
+def write_report(sheets, output_file, formats=('xlsx',)):
+    """
+    Write the tables of a report as an Excel workbook and/or as CSV or
+    Parquet files.
+
+    CSV and Parquet tables go into a folder named after the workbook
+    (ATestCumulativeReport.xlsx -> ATestCumulativeReport/<sheet>.csv).
+
+    Args:
+        sheets (dict): Sheet name -> DataFrame, in sheet order
+        output_file (str): Path of the .xlsx workbook
+        formats (iterable): Any of REPORT_FORMATS
+
+    Returns:
+        list: Paths of the written files
+    """
+    for output_format in formats:
+        if output_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format '{output_format}', expected one of {REPORT_FORMATS}")
+
+    paths = []
+    if 'xlsx' in formats:
+        paths.append(write_workbook(sheets, output_file))
+
+    table_dir = os.path.splitext(output_file)[0]
+    for output_format in ('csv', 'parquet'):
+        if output_format not in formats:
+            continue
+        os.makedirs(table_dir, exist_ok=True)
+        for sheet_name, table in sheets.items():
+            path = os.path.join(table_dir, f'{sheet_name}.{output_format}')
+            if output_format == 'csv':
+                table.to_csv(path, index=False)
+            else:
+                table.to_parquet(path, index=False)
+            paths.append(path)
+    return paths
@@ -0,0 +1,123 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Columns set on the demand data for every (Circuit, Year, Month)
+THRESHOLD_COLUMNS = ['Buffer', 'D1Limit', 'D2Limit', 'D3Limit']
+KEY_COLUMNS = ['Circuit', 'Year', 'Month']
+
+MONTHS = {name: number for number, name in enumerate(
+    ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+     'August', 'September', 'October', 'November', 'December'], start=1)}
+
+
+def _parse_season_sheet(sheet, year):
+    """
+    Read one season sheet laid out like '2024 Thresholds.xlsx': an
+    '<X> Circuit' header over D1/D2/D3 columns with one row per month, and an
+    '<X> FEED' settings block holding the Buffer.
+    """
+    rows = []
+    buffers = {}
+    cells = sheet.astype(object)
+
+    for (r, c), cell in np.ndenumerate(cells.to_numpy()):
+        if not isinstance(cell, str):
+            continue
+
+        circuit_match = re.fullmatch(r'\s*(\w+) Circuit\s*', cell)
+        if circuit_match:
+            circuit = circuit_match.group(1)
+            # Month names sit in the first labelled column left of the block
+            # (the B block shares the month labels of the A block)
+            for month_row in range(r + 2, len(cells)):
+                labels = [cells.iat[month_row, col] for col in range(c - 1, -1, -1)]
+                month_name = next((label for label in labels if isinstance(label, str)), None)
+                if month_name is None or month_name.strip() not in MONTHS:
+                    break
+                limits = cells.iloc[month_row, c:c + 3].astype(float).to_numpy()
+                rows.append({
+                    'Circuit': circuit,
+                    'Year': year,
+                    'Month': MONTHS[month_name.strip()],
+                    # Limits are applied as whole kW, as they always have been
+                    'D1Limit': float(np.round(limits[0])),
+                    'D2Limit': float(np.round(limits[1])),
+                    'D3Limit': float(np.round(limits[2])),
+                })
+            continue
+
+        feed_match = re.fullmatch(r'\s*(\w+) FEED\s*', cell)
+        if feed_match:
+            # Look for the 'Buffer' label below the feed header
+            for label_row in range(r + 1, len(cells) - 1):
+                labels = cells.iloc[label_row, c:c + 3].tolist()
+                if 'Buffer' in labels:
+                    buffer_col = c + labels.index('Buffer')
+                    buffers[feed_match.group(1)] = float(cells.iat[label_row + 1, buffer_col])
+                    break
+
+    table = pd.DataFrame(rows, columns=KEY_COLUMNS + THRESHOLD_COLUMNS[1:])
+    table['Buffer'] = table['Circuit'].map(buffers).astype(float)
+    return table[KEY_COLUMNS + THRESHOLD_COLUMNS]
+
+
+def load_thresholds(file_path='2024 Thresholds.xlsx'):
+    """
+    Load the threshold registry keyed by (Circuit, Year, Month).
+
+    Excel files are read sheet by sheet, with the season year taken from the
+    sheet name (e.g. '2024 Season Thresholds Used'), falling back to the file
+    name. CSV files must already be in long format with Circuit, Year, Month,
+    Buffer, D1Limit, D2Limit and D3Limit columns.
+
+    Args:
+        file_path (str): Path to the threshold workbook or CSV
+
+    Returns:
+        pd.DataFrame: One row per (Circuit, Year, Month)
+    """
+    if str(file_path).lower().endswith('.csv'):
+        table = pd.read_csv(file_path)
+        table['Circuit'] = table['Circuit'].astype(str)
+    else:
+        file_year = re.search(r'(\d{4})', str(file_path))
+        tables = []
+        for sheet_name, sheet in pd.read_excel(file_path, sheet_name=None, header=None).items():
+            year = re.search(r'(\d{4})', sheet_name) or file_year
+            if year is None:
+                raise ValueError(f"Cannot tell the season year of sheet '{sheet_name}' in {file_path}")
+            tables.append(_parse_season_sheet(sheet, int(year.group(1))))
+        table = pd.concat(tables, ignore_index=True)
+
+    if table.duplicated(KEY_COLUMNS).any():
+        raise ValueError(f"Duplicate (Circuit, Year, Month) thresholds in {file_path}")
+
+    return table[KEY_COLUMNS + THRESHOLD_COLUMNS].reset_index(drop=True)
+
+
+def apply_thresholds(df, thresholds):
+    """
+    Set Buffer, D1Limit, D2Limit and D3Limit on df from the registry with a
+    single indexed lookup. Rows without a matching (Circuit, Year, Month) get NaN.
+
+    Args:
+        df (pd.DataFrame): Demand data with Circuit, Year and Month columns
+        thresholds (pd.DataFrame): Registry from load_thresholds
+
+    Returns:
+        pd.DataFrame: df with the threshold columns set
+    """
+    registry = pd.MultiIndex.from_frame(thresholds[KEY_COLUMNS])
+    keys = pd.MultiIndex.from_arrays([df['Circuit'].astype(str), df['Year'], df['Month']])
+    position = registry.get_indexer(keys)
+
+    # Append an all-NaN row so unmatched rows (-1) take NaN
+    values = thresholds[THRESHOLD_COLUMNS].to_numpy(dtype=float)
+    values = np.vstack([values, np.full(len(THRESHOLD_COLUMNS), np.nan)])
+    taken = values[position]
+
+    for i, column in enumerate(THRESHOLD_COLUMNS):
+        df[column] = taken[:, i]
+    return df
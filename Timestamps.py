@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Local time zone of the campus meters
+FEED_TIMEZONE = 'America/New_York'
+
+# Date column of the feed exports, e.g. '4/23/2024 01:43:12 PM EDT'.
+# Meter log entries ('Log Enabled') also carry milliseconds.
+FEED_DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+FEED_LOG_DATE_FORMAT = '%m/%d/%Y %I:%M:%S.%f %p'
+
+# Hours behind UTC for each suffix, used to resolve the fall-back hour
+SUFFIX_UTC_OFFSET = {'EST': 5, 'EDT': 4}
+
+# Day zero of the Excel serial date system
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+# The last 15 characters of a feed date have a fixed layout: 'hh:mm:ss AM EST'
+_TAIL_WIDTH = 15
+_DIGIT_COLS = [0, 1, 3, 4, 6, 7]
+
+
+def _char_codes(strings, width):
+    """Character codes of the strings as an (n, width) array, padded with 0."""
+    return np.array(strings.to_numpy(dtype=object), dtype=f'U{width}').view(np.uint32).reshape(-1, width)
+
+
+def _fallback_wall_clock(wall_text):
+    """Parse wall-clock strings that do not fit the fixed layout."""
+    wall = pd.to_datetime(wall_text, format=FEED_DATE_FORMAT, errors='coerce')
+    log_wall = pd.to_datetime(wall_text, format=FEED_LOG_DATE_FORMAT, errors='coerce')
+    return wall.astype('datetime64[ms]').fillna(log_wall.astype('datetime64[ms]'))
+
+
+def parse_feed_timestamps(dates, excel_time=None, tz=FEED_TIMEZONE):
+    """
+    Parse the EST/EDT-suffixed Date column of the feed exports into tz-aware
+    timestamps.
+
+    The clock and suffix sit in the fixed-width tail of every string, so their
+    characters are read straight from a character array; the date part only has
+    a few hundred distinct values a year and is parsed once per distinct value.
+    When excel_time is given, the wall clock is taken from the 'Excel Time'
+    serial column instead (rounded to the millisecond), and only rows without
+    a serial time are parsed from their string.
+
+    The EST/EDT suffix then fixes the UTC offset of every row, so the repeated
+    1 AM hour in November is resolved from the data instead of being dropped as
+    NaT. Rows that do not fit the layout (e.g. log entries with milliseconds)
+    are parsed with the explicit formats; rows without a suffix are localized
+    directly, with ambiguous times set to NaT.
+
+    Args:
+        dates (pd.Series): Date strings such as '4/23/2024 01:43:12 PM EDT'
+        excel_time (pd.Series, optional): Excel serial times for the same rows
+        tz (str): Time zone to convert the timestamps to
+
+    Returns:
+        tuple: (timestamps, suffix) where timestamps is a tz-aware Series and
+        suffix holds 'EST'/'EDT' (NaN when the row has no suffix)
+    """
+    dates = pd.Series(dates).astype(str)
+    index = dates.index
+
+    # Suffix and clock from the fixed-width tail
+    tail = _char_codes(dates.str[-_TAIL_WIDTH:], _TAIL_WIDTH)
+    is_est = (tail[:, 11:] == np.array([ord(c) for c in ' EST'])).all(axis=1)
+    is_edt = (tail[:, 11:] == np.array([ord(c) for c in ' EDT'])).all(axis=1)
+    has_suffix = is_est | is_edt
+    utc_offset_hours = np.where(is_est, SUFFIX_UTC_OFFSET['EST'], SUFFIX_UTC_OFFSET['EDT'])
+
+    if excel_time is not None:
+        serial = pd.Series(excel_time, index=index).to_numpy(dtype=float)
+        wall = (EXCEL_EPOCH + pd.to_timedelta(np.round(serial * 86_400_000), unit='ms')).to_numpy()
+        # Rows without a serial time are parsed from their Date string
+        fits_layout = ~np.isnan(serial)
+    else:
+        digits = tail.astype(np.int64) - ord('0')
+
+        # Date part, parsed once per distinct day
+        codes, uniques = pd.factorize(dates.str[:-(_TAIL_WIDTH + 1)])
+        days = pd.to_datetime(pd.Index(uniques), format='%m/%d/%Y', errors='coerce').to_numpy()
+
+        fits_layout = (has_suffix & (codes >= 0)
+                       & ((digits[:, _DIGIT_COLS] >= 0) & (digits[:, _DIGIT_COLS] <= 9)).all(axis=1)
+                       & (tail[:, 2] == ord(':')) & (tail[:, 5] == ord(':')) & (tail[:, 8] == ord(' '))
+                       & np.isin(tail[:, 9], [ord('A'), ord('P')]) & (tail[:, 10] == ord('M')))
+
+        hour = (digits[:, 0] * 10 + digits[:, 1]) % 12 + 12 * (tail[:, 9] == ord('P'))
+        seconds = hour * 3600 + (digits[:, 3] * 10 + digits[:, 4]) * 60 + digits[:, 6] * 10 + digits[:, 7]
+        wall = days[np.maximum(codes, 0)] + seconds.astype('timedelta64[s]')
+        wall[~fits_layout] = np.datetime64('NaT')
+
+    # Wall time + suffix offset gives the exact UTC instant
+    utc = wall.astype('datetime64[ms]') + (utc_offset_hours * 3600).astype('timedelta64[s]')
+
+    # Strings that do not fit the fixed layout
+    slow = ~fits_layout | ~has_suffix
+    if slow.any():
+        with_suffix = has_suffix[slow]
+        wall_text = dates[slow].where(~with_suffix, dates[slow].str[:-4])
+        slow_wall = _fallback_wall_clock(wall_text)
+        offset = pd.to_timedelta(utc_offset_hours[slow] * 3600, unit='s')
+        local_utc = (slow_wall.dt.tz_localize(tz, ambiguous='NaT', nonexistent='NaT')
+                     .dt.tz_convert('UTC').dt.tz_localize(None))
+        utc[slow] = np.where(with_suffix, (slow_wall + offset).to_numpy(), local_utc.to_numpy())
+
+    timestamps = pd.Series(pd.DatetimeIndex(utc).tz_localize('UTC').tz_convert(tz), index=index)
+    suffix = pd.Series(np.where(is_est, 'EST', np.where(is_edt, 'EDT', None)), index=index)
+    return timestamps, suffix
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# Bump when the way the columnar copies are written changes, so old ones are
+# converted again
+SIDECAR_VERSION = 1
+
+# Workbooks parsed in this run: (absolute path, size, mtime) -> {sheet name: DataFrame}
+_WORKBOOKS = {}
+
+
+def workbook_fingerprint(path, block_size=1 << 20):
+    """
+    SHA-256 over the contents of a workbook (and the sidecar version).
+    """
+    digest = hashlib.sha256(f"version={SIDECAR_VERSION}".encode())
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sidecar_path(path):
+    """Folder holding the columnar copy of a workbook (one Parquet file per sheet)."""
+    return path + '.parquet'
+
+
+def _read_sidecar(path, fingerprint):
+    directory = sidecar_path(path)
+    fingerprint_file = directory + '.json'
+    if not os.path.exists(fingerprint_file):
+        return None
+
+    with open(fingerprint_file) as handle:
+        sidecar = json.load(handle)
+    if sidecar.get('fingerprint') != fingerprint:
+        return None
+
+    # Sheets come back in workbook order
+    return {name: pd.read_parquet(os.path.join(directory, file_name))
+            for name, file_name in sidecar['sheets'].items()}
+
+
+def _write_sidecar(path, fingerprint, sheets):
+    directory = sidecar_path(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        files = {}
+        for number, (name, sheet) in enumerate(sheets.items()):
+            # Sheet names are not always valid file names
+            files[name] = f'sheet{number:02d}.parquet'
+            sheet.to_parquet(os.path.join(directory, files[name]), index=False)
+    except (ImportError, NotImplementedError, OSError, TypeError, ValueError) as e:
+        # Columns Parquet cannot hold (e.g. mixed types); keep the workbook in memory only
+        print(f"Warning: could not write a columnar copy of {path}: {str(e)}")
+        return
+
+    with open(directory + '.json', 'w') as handle:
+        json.dump({'fingerprint': fingerprint,
+                   'workbook': os.path.basename(path),
+                   'sheets': files}, handle, indent=2)
+
+
+def read_workbook(path, sheet_names=None, sidecar=True):
+    """
+    Sheets of a workbook, parsed once per run.
+
+    The first request for a workbook reads all of its sheets in one pass and
+    keeps them in memory; later requests (for any sheet) are served from
+    there until the file changes. With sidecar, the sheets are also written
+    once to a columnar copy next to the workbook (<workbook>.parquet/), and
+    later runs read that copy instead of parsing the workbook again, as long
+    as the workbook's contents are unchanged.
+
+    Args:
+        path (str): Path of the Excel workbook
+        sheet_names (list): Sheets to return (default: all, in workbook order)
+        sidecar (bool): Use and keep the columnar copy
+
+    Returns:
+        dict: Sheet name -> DataFrame (a copy the caller may modify)
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    if key not in _WORKBOOKS:
+        sheets = None
+        if sidecar:
+            fingerprint = workbook_fingerprint(path)
+            sheets = _read_sidecar(path, fingerprint)
+        if sheets is None:
+            sheets = pd.read_excel(path, sheet_name=None)
+            if sidecar:
+                _write_sidecar(path, fingerprint, sheets)
+        _WORKBOOKS[key] = sheets
+
+    sheets = _WORKBOOKS[key]
+    names = list(sheets) if sheet_names is None else list(sheet_names)
+    for name in names:
+        if name not in sheets:
+            raise ValueError(f"Worksheet named '{name}' not found in {path}")
+    return {name: sheets[name].copy() for name in names}
+
+
+def read_sheet(path, sheet_name, sidecar=True):
+    """
+    One sheet of a workbook, served from the parsed workbook (see read_workbook).
+    """
+    return read_workbook(path, [sheet_name], sidecar)[sheet_name]